@@ -4,6 +4,7 @@ import tempfile
 import os
 import time
 from pose_processor import VideoProcessor # Import processor class
+from rtmlib import SessionConfig
 import pandas as pd
 import config
 import imageio
@@ -19,8 +20,35 @@ st.sidebar.header("⚙️ Options")
 # Add options later (e.g., model selection, thresholds)
 selected_exercise = st.sidebar.selectbox("Select Exercise (MVP Focus: Squat)", ["Squat"]) #, "Deadlift", "Bench Press"]) # Add more later
 device_option = st.sidebar.selectbox("Select Compute Device", ["cpu", "cuda", "mps"], help="Select 'cuda' or 'mps' if you have compatible hardware and drivers installed.")
+subject_option = st.sidebar.selectbox("Lifter Selection", ["All people", "Largest person", "Most central person", "Person at point"], index=0, help="Pick the lifter once and run pose estimation on that person only, bystanders cost nothing. All people: estimate everyone and analyze the first one.")
+subject_point = (0.5, 0.5)
+if subject_option == "Person at point":
+    subject_point = (st.sidebar.slider("Lifter X (% of width)", 0, 100, 50) / 100,
+                     st.sidebar.slider("Lifter Y (% of height)", 0, 100, 50) / 100)
+subject_lock = {"All people": None, "Largest person": "largest", "Most central person": "central", "Person at point": subject_point}[subject_option]
+roi_detection = st.sidebar.checkbox("Re-detect Around Lifter", value=False, disabled=subject_lock is None, help="Run the person detector on a crop around the lifter's last position, at a smaller input size when the model allows it, and search the full frame only periodically or when the lifter is lost. Faster and sharper on high resolution footage where the lifter fills a small part of the frame.") and subject_lock is not None
 model_mode = st.sidebar.selectbox("Select Model Mode", ["balanced", "lightweight", "performance"], index=0, help="Balanced: Good speed/accuracy. Lightweight: Faster, less accurate. Performance: Slower, more accurate.")
 
+# --- Runtime Options (ONNX Runtime session settings) ---
+with st.sidebar.expander("Runtime Options"):
+    intra_op_threads = st.number_input("Intra-op Threads", min_value=0, max_value=os.cpu_count() or 64, value=0, help="Threads used inside one operator. 0 = let ONNX Runtime decide (all cores). Lower this when running several workers on one machine.")
+    inter_op_threads = st.number_input("Inter-op Threads", min_value=0, max_value=os.cpu_count() or 64, value=0, help="Threads used across operators in 'parallel' execution mode. 0 = default.")
+    execution_mode = st.selectbox("Execution Mode", list(SessionConfig.EXECUTION_MODES), index=0)
+    graph_optimization_level = st.selectbox("Graph Optimization Level", list(SessionConfig.OPTIMIZATION_LEVELS), index=len(SessionConfig.OPTIMIZATION_LEVELS) - 1)
+    enable_mem_arena = st.checkbox("Enable Memory Arena", value=True)
+    allow_spinning = st.checkbox("Allow Thread Spinning", value=True, help="Idle threads busy-wait for work. Turn off when cores are shared with other workers.")
+    io_binding = st.checkbox("Use IOBinding", value=False, help="Reuse persistent input/output buffers across frames instead of allocating new ones.")
+    batch_size = st.number_input("Frames per Batch", min_value=1, max_value=64, value=1, help="Decode this many frames ahead and run the detector and pose model on them in one batch. Raises throughput on uploaded videos; models exported with a fixed batch size run in chunks.")
+    analysis_fps = st.number_input("Target Analysis FPS", min_value=0, max_value=240, value=0, help="Run pose estimation on about this many frames per second; the frames in between are skipped without decoding and their metrics interpolated. 0 = analyze every frame. 15-30 is plenty for slow-motion uploads.")
+    det_frequency = st.number_input("Detection Frequency", min_value=1, max_value=60, value=1, help="Run the person detector on every N-th analyzed frame; in between, each person's box is taken from their keypoints in the previous frame. Detection is about half the cost of a frame. 1 = detect on every frame.")
+    tracking = st.checkbox("Track People", value=False, help="Follow people across frames by box overlap so the analyzed person stays the same. With tracking or a detection frequency above 1, frames go through the models one at a time.")
+    motion_gate = st.checkbox("Skip Static Frames", value=False, help="Compare a small grayscale thumbnail of every frame with the last analyzed one inside the lifter's box, and reuse its keypoints when nothing moved. Large speedup on fixed-camera recordings with long pauses between reps. With pipelined processing, detection then runs in the pose stage.")
+    two_pass = st.checkbox("Two-pass Analysis (coarse to fine)", value=False, help="First scan the whole video with the lightweight model at a few frames per second to find the reps, then run the selected model at full rate only around them. Setup, walkout and racking keep the coarse results and are not drawn.")
+    pipelined = st.checkbox("Pipelined Processing", value=False, help="Decode, detect, estimate poses and draw on separate threads so the stages overlap. Works best with the intra-op threads split between the detector and pose model instead of 0 (all cores each).")
+    num_workers = st.number_input("Worker Processes", min_value=1, max_value=os.cpu_count() or 64, value=1, help="Split the video into frame ranges analyzed in parallel by this many processes, each with its own models. 1 = analyze in this process. Cores are split between workers when intra-op threads is 0.")
+    parallel_mode = st.selectbox("Parallel Mode", ["Frame ranges", "Shared-memory frame ring"], index=0, help="Frame ranges: each worker decodes and analyzes its own part of the video. Shared-memory frame ring: this process decodes into shared memory and the workers only run pose estimation, no frame is ever pickled.")
+    quantized = st.checkbox("Use INT8 Quantized Models", value=False, help="Faster on CPU with a small keypoint drift. Models are quantized on first use; run `python -m rtmlib.tools.quantization --calib <video>` once for calibrated models.")
+
 # --- Main Area ---
 uploaded_file = st.file_uploader("Choose a video file (.mp4, .mov, .avi)", type=["mp4", "mov", "avi"])
 
@@ -35,6 +63,16 @@ if uploaded_file is not None:
         col1, col2 = st.columns([2, 1]) # Column for video, column for metrics
 
         with col1:
+            if subject_option == "Person at point":
+                # Show where the point falls on the first frame, the lifter is the person closest to it
+                preview_cap = cv2.VideoCapture(video_path)
+                success, first_frame = preview_cap.read()
+                preview_cap.release()
+                if success:
+                    h, w = first_frame.shape[:2]
+                    marker = (int(subject_point[0] * w), int(subject_point[1] * h))
+                    cv2.drawMarker(first_frame, marker, (0, 0, 255), cv2.MARKER_CROSS, max(20, w // 20), max(2, w // 300))
+                    st.image(cv2.cvtColor(first_frame, cv2.COLOR_BGR2RGB), caption="Lifter selection point", use_container_width=True)
             stframe = st.empty() # Placeholder for video frames
             stframe.info("Processing video... Please wait.")
 
@@ -46,80 +84,91 @@ if uploaded_file is not None:
         gif_bytes = None
 
         try:
-            # Initialize processor (consider caching this for efficiency)
-            # @st.cache_resource - Use caching if model loading is slow
+            # The models are cached across sessions, every upload gets its own tracker, gate and pipeline state
             @st.cache_resource
-            def get_video_processor(device, mode):
-                 # Using 'onnxruntime' as default backend based on rtmlib examples
-                return VideoProcessor(device=device, backend='onnxruntime', mode=mode)
-
-            processor = get_video_processor(device_option, model_mode)
-
-            start_process_time = time.time()
-            # <<< Get RGB frames and FPS from processor >>>
-            processed_frames_rgb, all_frame_metrics,fps = processor.process_video(video_path)
-            total_process_time = time.time() - start_process_time
-
-            if processed_frames_rgb is not None and len(processed_frames_rgb) > 0:
+            def get_video_processor(session_config, options):
+                # Using 'onnxruntime' as default backend based on rtmlib examples
+                return VideoProcessor(backend='onnxruntime', session_config=session_config, **options)
+
+            session_config = SessionConfig(intra_op_num_threads=int(intra_op_threads),
+                                           inter_op_num_threads=int(inter_op_threads),
+                                           execution_mode=execution_mode,
+                                           graph_optimization_level=graph_optimization_level,
+                                           enable_mem_arena=enable_mem_arena,
+                                           allow_spinning=allow_spinning,
+                                           io_binding=io_binding)
+            # VideoProcessor options, see its docstring
+            processor_options = dict(device=device_option, mode=model_mode, quantized=quantized, batch_size=int(batch_size),
+                                     pipelined=pipelined, target_analysis_fps=int(analysis_fps) or None, motion_gate=motion_gate,
+                                     det_frequency=int(det_frequency), tracking=tracking, subject_lock=subject_lock,
+                                     roi_detection=roi_detection)
+            processor = get_video_processor(session_config, processor_options).new_session()
+
+            # <<< Stream frames from the processor, writing the GIF as they arrive >>>
+            fps = processor.get_video_fps(video_path)
+            all_frame_metrics = []
+            num_frames = 0
+            if fps is not None:
+                # Only analyzed frames are drawn, skipped frames have metrics but no image
+                gif_fps = fps / processor.get_analysis_stride(fps)
+                # Calculate duration per frame for imageio (in seconds)
+                duration = 1.0 / gif_fps if gif_fps > 0 else 0.1 # Default 100ms duration if fps is unknown
+                gif_fps_limit = 30
+                if gif_fps > gif_fps_limit:
+                    duration = 1.0 / gif_fps_limit
+                # Video frames between two GIF frames, frames in between are never drawn
+                export_interval = fps / min(gif_fps, gif_fps_limit) if gif_fps > 0 else 1
+                next_export = 0.0
+
+                target_width = 720 # Adjust this target width as needed
+                target_dim = None
+                preview_every = 15 # Show a live preview every N frames
+
+                start_process_time = time.time()
+                gif_path = io.BytesIO() # Save GIF in memory
+                # Frames are resized and appended one at a time, full-resolution frames are never kept
+                with imageio.get_writer(gif_path, format='GIF', mode='I', duration=duration * 1000, loop=0) as gif_writer: # duration is in ms for imageio v3+
+                    if two_pass:
+                        frame_stream = processor.stream_video_two_pass(video_path)
+                    elif num_workers > 1 and parallel_mode == "Shared-memory frame ring":
+                        frame_stream = processor.stream_video_shared(video_path, num_workers=int(num_workers))
+                    elif num_workers > 1:
+                        frame_stream = processor.stream_video_parallel(video_path, num_workers=int(num_workers), render=export_interval)
+                    else:
+                        frame_stream = processor.stream_video(video_path)
+                    for frame_idx, frame_metrics, render in frame_stream:
+                        all_frame_metrics.append(frame_metrics)
+                        if render is None or frame_idx < next_export: # Not analyzed, or not needed at the GIF frame rate
+                            continue
+                        next_export = (frame_idx // export_interval + 1) * export_interval
+                        frame_rgb = render() # Only frames that go into the GIF are drawn
+
+                        if target_dim is None:
+                            # Get original dimensions from the first frame
+                            h, w, _ = frame_rgb.shape
+                            aspect_ratio = h / w
+                            target_height = int(target_width * aspect_ratio)
+                            target_dim = (target_width, target_height)
+
+                        # Resize using OpenCV (expects BGR, but works on RGB too)
+                        resized_frame = cv2.resize(frame_rgb, target_dim, interpolation=cv2.INTER_LINEAR)
+                        gif_writer.append_data(resized_frame)
+                        num_frames += 1
+
+                        if num_frames % preview_every == 1:
+                            caption = f"Analyzing... frame {frame_idx}"
+                            queue_depths = processor.get_queue_depths()
+                            if queue_depths: # Batches waiting after each pipeline stage
+                                caption += " | queued: " + ", ".join(f"{name} {depth}" for name, depth in queue_depths.items())
+                            stframe.image(resized_frame, channels="RGB", caption=caption, use_container_width=True)
+                total_process_time = time.time() - start_process_time
+
+            if num_frames > 0:
                 st.success(f"Video processing finished in {total_process_time:.2f} seconds.")
                 processing_done = True
-                
-                # # --- Display Processed Video ---
-                # delay = 0.03 # Delay between frames for playback effect (adjust as needed)
-                # stframe.info("Playing processed video...")
-                # for frame in processed_frames_rgb:
-                #     stframe.image(frame, channels="RGB", use_container_width=True)
-                #     time.sleep(delay) # Simulate video playback speed
-                # stframe.success("Playback finished.")
-
-                # # --- Create GIF ---
-                # with st.spinner("Creating GIF..."):
-                #     gif_path = io.BytesIO() # Save GIF in memory
-                #     # Calculate duration per frame for imageio (in seconds)
-                #     duration = 1.0 / fps if fps > 0 else 0.1 # Default 100ms duration if fps is unknown
-                #     # Limit FPS for smoother GIFs if original FPS is very high
-                #     gif_fps_limit = 15
-                #     if fps > gif_fps_limit:
-                #         duration = 1.0 / gif_fps_limit
-
-                #     imageio.mimsave(gif_path, processed_frames_rgb, format='GIF', duration=duration * 1000) # duration is in ms for imageio v3+
-                #     gif_bytes = gif_path.getvalue()
-                # stframe.success("GIF Created!")
-
-                # --- Create GIF ---
-                with st.spinner("Creating smaller GIF..."):
-                    gif_path = io.BytesIO() # Save GIF in memory
-
-                    # --- Add Resizing Logic ---
-                    target_width = 720 # Adjust this target width as needed
-                    resized_frames = []
-                    if len(processed_frames_rgb) > 0:
-                        # Get original dimensions from the first frame
-                        h, w, _ = processed_frames_rgb[0].shape
-                        aspect_ratio = h / w
-                        target_height = int(target_width * aspect_ratio)
-                        target_dim = (target_width, target_height)
-
-                        for frame in processed_frames_rgb:
-                            # Resize using OpenCV (expects BGR, but works on RGB too)
-                            resized_frame = cv2.resize(frame, target_dim, interpolation=cv2.INTER_LINEAR)
-                            resized_frames.append(resized_frame)
-                    else:
-                        resized_frames = processed_frames_rgb # Use original if no frames
-                    # --- End Resizing Logic ---
-
-                    # Calculate duration per frame for imageio (in seconds)
-                    duration = 1.0 / fps if fps > 0 else 0.1 # Default 100ms duration if fps is unknown
-                    gif_fps_limit = 30
-                    if fps > gif_fps_limit:
-                        duration = 1.0 / gif_fps_limit
-
-                    # <<< Use resized_frames for mimsave >>>
-                    imageio.mimsave(gif_path, resized_frames, format='GIF', duration=duration * 1000, loop=0) # duration is in ms for imageio v3+
-                    gif_bytes = gif_path.getvalue()
+                gif_bytes = gif_path.getvalue()
                 stframe.success("GIF Created!")
 
-
                 # --- Display GIF ---
                 stframe.image(gif_bytes, caption="Processed Analysis GIF", use_container_width=True)
 
@@ -134,6 +183,9 @@ if uploaded_file is not None:
                     summary_text = f"**Summary:**\n"
                     summary_text += f"- Minimum Knee Angle: {min_knee_angle:.1f}°\n" if min_knee_angle != float('inf') else "- Minimum Knee Angle: N/A\n"
                     summary_text += f"- Avg. Frame Processing Time: {avg_proc_time:.3f}s\n"
+                    if 'motion_skipped' in df_metrics: # Share of analyzed frames the motion gate found static
+                        skip_rate = df_metrics['motion_skipped'].dropna().astype(bool).mean()
+                        summary_text += f"- Static Frames Skipped: {skip_rate:.1%}\n"
 
                     # Check overall depth based on min angle
                     if min_knee_angle != float('inf'):
@@ -148,10 +200,14 @@ if uploaded_file is not None:
                     summary_text += f"\n**Frame-by-Frame Data:**"
                     metrics_placeholder.markdown(summary_text)
                     # Rename columns before displaying the DataFrame
-                    df_display = df_metrics[['frame', 'knee_angle', 'squat_depth_feedback']].rename(columns={
+                    display_columns = ['frame', 'knee_angle', 'squat_depth_feedback']
+                    if 'pass' in df_metrics: # Two-pass analysis marks where each frame came from
+                        display_columns.append('pass')
+                    df_display = df_metrics[display_columns].rename(columns={
                         'frame': 'Frame',
                         'knee_angle': 'Knee Angle (°)',
-                        'squat_depth_feedback': 'Squat Depth Feedback'
+                        'squat_depth_feedback': 'Squat Depth Feedback',
+                        'pass': 'Analysis Pass'
                     })
                     st.dataframe(df_display) # Display full data with new column names
 
@@ -0,0 +1,109 @@
+'''
+Microbenchmark of RTMPose crop extraction against the number of people.
+
+"legacy" is the per-bbox `RTMPose.preprocess` loop (`bbox_xyxy2cs`,
+`get_warp_matrix`, `top_down_affine` and float64 normalization, then
+stacking and the HWC->CHW conversion of `BaseTool.inference`). "batched"
+is `RTMPose.preprocess_batch`, with vectorized warp matrices and threaded
+`cv2.warpAffine` into a preallocated buffer. No model is needed.
+
+Example:
+
+python benchmarks/bench_affine.py --max-persons 16 --threads 4
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtmlib.tools.pose_estimation.pre_processings import (  # noqa: E402
+    BatchTopDownAffine, bbox_xyxy2cs, top_down_affine)
+
+MEAN = np.array((123.675, 116.28, 103.53))
+STD = np.array((58.395, 57.12, 57.375))
+
+
+def legacy_preprocess(img, bboxes, model_input_size):
+    imgs = []
+    for bbox in bboxes:
+        center, scale = bbox_xyxy2cs(np.array(bbox), padding=1.25)
+        resized_img, scale = top_down_affine(model_input_size, scale, center,
+                                             img)
+        imgs.append((resized_img - MEAN) / STD)
+    imgs = np.stack(imgs).transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(imgs, dtype=np.float32)
+
+
+def batched_preprocess(affine, img, bboxes, out):
+    crops, _, _ = affine(img, bboxes)
+    out = out[:len(crops)]
+    for c in range(3):
+        np.subtract(crops[..., c], MEAN[c], out=out[:, c], casting='unsafe')
+        np.multiply(out[:, c], 1. / STD[c], out=out[:, c], casting='unsafe')
+    return out
+
+
+def make_bboxes(num_persons, width, height):
+    """Spread `num_persons` person-sized boxes across the frame."""
+    box_w = width / (num_persons + 1)
+    bboxes = []
+    for i in range(num_persons):
+        x1 = i * box_w + box_w * 0.5
+        bboxes.append([x1, height * 0.1, x1 + box_w, height * 0.9])
+    return np.array(bboxes)
+
+
+def time_call(fn, repeat, warmup=3):
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--input-size', type=int, nargs=2, default=(288, 384),
+                        help='model input size (w, h)')
+    parser.add_argument('--max-persons', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    model_input_size = tuple(args.input_size)
+    affine = BatchTopDownAffine(model_input_size, num_threads=args.threads)
+    w, h = model_input_size
+    out = np.empty((args.max_persons, 3, h, w), dtype=np.float32)
+
+    height, width = 1080, 1920
+    frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+
+    print(f'warp threads: {affine.num_threads}')
+    print(f'{"persons":>8} {"legacy (ms)":>12} {"batched (ms)":>13} '
+          f'{"speedup":>8} {"max diff":>9}')
+    for num_persons in (1, 2, 4, 8, 16):
+        if num_persons > args.max_persons:
+            break
+        bboxes = make_bboxes(num_persons, width, height)
+
+        ref = legacy_preprocess(frame, bboxes, model_input_size)
+        new = batched_preprocess(affine, frame, bboxes, out)
+        diff = np.abs(ref - new).max()
+
+        t_legacy = time_call(
+            lambda: legacy_preprocess(frame, bboxes, model_input_size),
+            args.repeat)
+        t_batched = time_call(
+            lambda: batched_preprocess(affine, frame, bboxes, out),
+            args.repeat)
+        print(f'{num_persons:>8} {t_legacy:>12.2f} {t_batched:>13.2f} '
+              f'{t_legacy / t_batched:>7.2f}x {diff:>9.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''
+Cold-start time of a solution with and without the optimized-model cache.
+
+Every start runs in a fresh interpreter, so nothing is shared in memory
+between runs. Three cases are timed: the cache disabled, a cold cache
+(the optimized model is written on this start) and a warm cache (the
+optimized model is loaded and the graph optimizations are skipped). Only
+the construction of the solution and its first call are timed; imports and
+checkpoint downloads are not.
+
+Example:
+
+python benchmarks/bench_cold_start.py --mode balanced --repeat 3
+'''
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build(args, cache_dir):
+    import rtmlib
+
+    session_config = rtmlib.SessionConfig(
+        cache_optimized_model=cache_dir is not None,
+        model_cache_dir=cache_dir)
+    kwargs = dict(mode=args.mode, session_config=session_config)
+    if args.det is not None:
+        kwargs.update(det=args.det, det_input_size=tuple(args.det_input_size))
+    if args.pose is not None:
+        kwargs.update(pose=args.pose,
+                      pose_input_size=tuple(args.pose_input_size))
+    return getattr(rtmlib, args.solution)(**kwargs)
+
+
+def child(args):
+    import rtmlib  # noqa: F401
+    cache_dir = None if args.child == 'off' else args.cache_dir
+    frame = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    solution = build(args, cache_dir)
+    built = time.perf_counter()
+    solution(frame)
+    first = time.perf_counter()
+    print(json.dumps({
+        'build': (built - start) * 1000,
+        'first': (first - built) * 1000
+    }))
+
+
+def run(case, cache_dir):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', case,
+           '--cache-dir', cache_dir] + sys.argv[1:]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--solution', default='Body')
+    parser.add_argument('--mode', default='balanced')
+    parser.add_argument('--det', default=None, help='local detector onnx')
+    parser.add_argument('--det-input-size', type=int, nargs=2,
+                        default=(640, 640))
+    parser.add_argument('--pose', default=None, help='local pose onnx')
+    parser.add_argument('--pose-input-size', type=int, nargs=2,
+                        default=(192, 256))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args)
+        return
+
+    # download the checkpoints once, outside of the timed runs
+    build(args, None)
+
+    times = {'off': [], 'cold': [], 'warm': []}
+    for _ in range(args.repeat):
+        cache_dir = tempfile.mkdtemp(prefix='rtmlib_ort_cache_')
+        try:
+            times['off'].append(run('off', cache_dir))
+            times['cold'].append(run('cold', cache_dir))
+            times['warm'].append(run('warm', cache_dir))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f'{args.repeat} runs of {args.solution}(mode={args.mode!r})')
+    print(f'{"cache":>6} {"build (ms)":>11} {"first call (ms)":>16}')
+    for case, values in times.items():
+        build_ms = np.median([v['build'] for v in values])
+        first_ms = np.median([v['first'] for v in values])
+        print(f'{case:>6} {build_ms:>11.1f} {first_ms:>16.1f}')
+    speedup = np.median([v['build'] for v in times['off']]) / \
+        np.median([v['build'] for v in times['warm']])
+    print(f'warm cache build speedup: {speedup:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+'''
+Throughput of sending decoded frames to worker processes, pickled against
+shared memory.
+
+The pickled path puts every frame on a `multiprocessing` queue, as a naive
+process pool would. The shared-memory path writes it into a slot of a
+`FrameRing` and only sends the slot index, which the worker acknowledges
+once it is done with the frame. Workers only touch the frame (a strided
+sum), so the numbers are the transport cost alone.
+
+Example:
+
+python benchmarks/bench_frame_transport.py --size 1920 1080 --workers 4
+'''
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_ring import FrameRing  # noqa: E402
+
+
+def touch(frame):
+    return int(frame[::64, ::64].sum())
+
+
+def pickled_worker(tasks, results):
+    while True:
+        frame = tasks.get()
+        if frame is None:
+            break
+        results.put(touch(frame))
+
+
+def shared_worker(ring_spec, tasks, results):
+    ring = FrameRing(*ring_spec)
+    while True:
+        slot = tasks.get()
+        if slot is None:
+            break
+        touch(ring.view(slot))
+        results.put(slot)
+    ring.close()
+
+
+def run_pickled(context, frame, num_frames, num_workers, in_flight):
+    tasks, results = context.Queue(), context.Queue()
+    workers = [context.Process(target=pickled_worker, args=(tasks, results))
+               for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    start = time.perf_counter()
+    sent = received = 0
+    while received < num_frames:
+        while sent < num_frames and sent - received < in_flight:
+            tasks.put(frame)
+            sent += 1
+        results.get()
+        received += 1
+    elapsed = time.perf_counter() - start
+
+    for worker in workers:
+        tasks.put(None)
+    for worker in workers:
+        worker.join()
+    return num_frames / elapsed
+
+
+def run_shared(context, frame, num_frames, num_workers, in_flight):
+    ring = FrameRing(in_flight, frame.shape, frame.dtype)
+    tasks, results = context.Queue(), context.Queue()
+    workers = [context.Process(target=shared_worker,
+                               args=(ring.spec, tasks, results))
+               for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    start = time.perf_counter()
+    free_slots = list(range(in_flight))
+    sent = received = 0
+    while received < num_frames:
+        while sent < num_frames and free_slots:
+            slot = free_slots.pop()
+            # stands in for decoding straight into the slot
+            np.copyto(ring.view(slot), frame)
+            tasks.put(slot)
+            sent += 1
+        free_slots.append(results.get())
+        received += 1
+    elapsed = time.perf_counter() - start
+
+    for worker in workers:
+        tasks.put(None)
+    for worker in workers:
+        worker.join()
+    ring.close()
+    return num_frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, nargs=2, default=(1920, 1080),
+                        help='frame width and height')
+    parser.add_argument('--workers', type=int, nargs='+', default=(1, 2, 4))
+    parser.add_argument('--num-frames', type=int, default=300)
+    parser.add_argument('--in-flight', type=int, default=8,
+                        help='frames in flight, ring slots')
+    args = parser.parse_args()
+
+    width, height = args.size
+    frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    mb = frame.nbytes / 1e6
+    context = multiprocessing.get_context('spawn')
+
+    print(f'{args.num_frames} frames of {width}x{height} ({mb:.1f} MB)')
+    print(f'{"workers":>8} {"pickled fps":>12} {"shm fps":>9} '
+          f'{"pickled MB/s":>13} {"shm MB/s":>9} {"speedup":>8}')
+    for num_workers in args.workers:
+        pickled = run_pickled(context, frame, args.num_frames, num_workers,
+                              args.in_flight)
+        shared = run_shared(context, frame, args.num_frames, num_workers,
+                            args.in_flight)
+        print(f'{num_workers:>8} {pickled:>12.1f} {shared:>9.1f} '
+              f'{pickled * mb:>13.0f} {shared * mb:>9.0f} '
+              f'{shared / pickled:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
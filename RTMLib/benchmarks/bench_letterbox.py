@@ -0,0 +1,95 @@
+'''
+Microbenchmark of detector/RTMO preprocessing on 1080p and 4K frames.
+
+"legacy" is the preprocessing YOLOX, RTMDet and RTMO used to copy-paste
+(fresh padded canvas, float64 normalization) followed by the HWC->CHW
+float32 conversion done in `BaseTool.inference`. "letterbox" is the shared
+`LetterBox` engine, which produces the same model input in one pass.
+
+Example:
+
+python benchmarks/bench_letterbox.py --repeat 50
+'''
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtmlib.tools.object_detection.pre_processings import LetterBox  # noqa: E402,E501
+
+RESOLUTIONS = {'1080p': (1080, 1920), '4K': (2160, 3840)}
+# (mean, std) as used by YOLOX/RTMO (None) and RTMDet
+NORMALIZATIONS = {
+    'no-norm': (None, None),
+    'mean/std': ((103.53, 116.28, 123.675), (57.375, 57.12, 58.395)),
+}
+
+
+def legacy_preprocess(img, model_input_size, mean, std):
+    padded_img = np.ones(
+        (model_input_size[0], model_input_size[1], 3), dtype=np.uint8) * 114
+
+    ratio = min(model_input_size[0] / img.shape[0],
+                model_input_size[1] / img.shape[1])
+    resized_img = cv2.resize(
+        img,
+        (int(img.shape[1] * ratio), int(img.shape[0] * ratio)),
+        interpolation=cv2.INTER_LINEAR,
+    ).astype(np.uint8)
+    padded_shape = (int(img.shape[0] * ratio), int(img.shape[1] * ratio))
+    padded_img[:padded_shape[0], :padded_shape[1]] = resized_img
+
+    if mean is not None:
+        mean = np.array(mean)
+        std = np.array(std)
+        padded_img = (padded_img - mean) / std
+
+    # what BaseTool.inference did with it
+    padded_img = padded_img.transpose(2, 0, 1)
+    padded_img = np.ascontiguousarray(padded_img, dtype=np.float32)
+    return padded_img, ratio
+
+
+def time_call(fn, repeat, warmup=3):
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--input-size', type=int, default=640)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    model_input_size = (args.input_size, args.input_size)
+
+    print(f'{"frame":>6} {"norm":>9} {"legacy (ms)":>12} '
+          f'{"letterbox (ms)":>15} {"speedup":>8} {"max diff":>9}')
+    for res_name, (h, w) in RESOLUTIONS.items():
+        frame = np.random.randint(0, 255, (h, w, 3), dtype=np.uint8)
+        for norm_name, (mean, std) in NORMALIZATIONS.items():
+            letterbox = LetterBox(model_input_size, mean, std)
+
+            ref, _ = legacy_preprocess(frame, model_input_size, mean, std)
+            out, _ = letterbox(frame)
+            diff = np.abs(ref - out).max()
+
+            t_legacy = time_call(
+                lambda: legacy_preprocess(frame, model_input_size, mean, std),
+                args.repeat)
+            t_new = time_call(lambda: letterbox(frame), args.repeat)
+            print(f'{res_name:>6} {norm_name:>9} {t_legacy:>12.2f} '
+                  f'{t_new:>15.2f} {t_legacy / t_new:>7.2f}x {diff:>9.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+'''
+Benchmark of `multiclass_nms` against the previous per-class while-loop NMS.
+
+Synthetic raw detector output with 8,400 candidates (a 640x640 YOLOX head)
+clustered around a few people, at several score thresholds. "exact" is
+`multiclass_nms(top_k=None)` and `nms()` with its default, which must keep
+exactly the same boxes as the legacy implementation; "top-k" is the default
+path of `multiclass_nms`. The speedup of each is reported separately.
+
+Example:
+
+python benchmarks/bench_nms.py --num-classes 1
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtmlib.tools.object_detection.post_processings import multiclass_nms  # noqa: E402,E501
+
+
+def legacy_nms(boxes, scores, nms_thr):
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = boxes[:, 2]
+    y2 = boxes[:, 3]
+
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+
+        w = np.maximum(0.0, xx2 - xx1 + 1)
+        h = np.maximum(0.0, yy2 - yy1 + 1)
+        inter = w * h
+        ovr = inter / (areas[i] + areas[order[1:]] - inter)
+
+        inds = np.where(ovr <= nms_thr)[0]
+        order = order[inds + 1]
+
+    return keep
+
+
+def legacy_multiclass_nms(boxes, scores, nms_thr, score_thr):
+    final_dets = []
+    num_classes = scores.shape[1]
+    for cls_ind in range(num_classes):
+        cls_scores = scores[:, cls_ind]
+        valid_score_mask = cls_scores > score_thr
+        if valid_score_mask.sum() == 0:
+            continue
+        valid_scores = cls_scores[valid_score_mask]
+        valid_boxes = boxes[valid_score_mask]
+        keep = legacy_nms(valid_boxes, valid_scores, nms_thr)
+        if len(keep) > 0:
+            cls_inds = np.ones((len(keep), 1)) * cls_ind
+            dets = np.concatenate(
+                [valid_boxes[keep], valid_scores[keep, None], cls_inds], 1)
+            final_dets.append(dets)
+    if len(final_dets) == 0:
+        return None
+    return np.concatenate(final_dets, 0)
+
+
+def make_candidates(num_candidates, num_classes, rng):
+    """Boxes jittered around a few person-sized boxes, random scores."""
+    people = np.array([[100, 80, 260, 560], [300, 60, 420, 600],
+                       [450, 120, 600, 620]], dtype=np.float32)
+    owner = rng.integers(0, len(people), num_candidates)
+    jitter = rng.normal(0, 25, (num_candidates, 4)).astype(np.float32)
+    boxes = people[owner] + jitter
+    boxes[:, 2:] = np.maximum(boxes[:, 2:], boxes[:, :2] + 1)
+    scores = rng.random((num_candidates, num_classes)).astype(np.float32)
+    return boxes, scores
+
+
+def time_call(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num-candidates', type=int, default=8400)
+    parser.add_argument('--num-classes', type=int, default=1)
+    parser.add_argument('--nms-thr', type=float, default=0.45)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    boxes, scores = make_candidates(args.num_candidates, args.num_classes,
+                                    rng)
+
+    print(f'{args.num_candidates} candidates, {args.num_classes} classes')
+    print(f'{"score_thr":>9} {"valid":>7} {"legacy (ms)":>12} '
+          f'{"exact (ms)":>11} {"top-k (ms)":>11} {"exact x":>8} '
+          f'{"top-k x":>8} {"same":>5}')
+    for score_thr in (0.05, 0.3, 0.7):
+        ref = legacy_multiclass_nms(boxes, scores, args.nms_thr, score_thr)
+        dets, _ = multiclass_nms(boxes, scores, args.nms_thr, score_thr,
+                                 top_k=None)
+        same = ref is None and dets is None or (
+            ref.shape == dets.shape and np.allclose(ref, dets))
+
+        t_legacy = time_call(
+            lambda: legacy_multiclass_nms(boxes, scores, args.nms_thr,
+                                          score_thr), args.repeat)
+        t_exact = time_call(
+            lambda: multiclass_nms(boxes, scores, args.nms_thr, score_thr,
+                                   top_k=None), args.repeat)
+        t_topk = time_call(
+            lambda: multiclass_nms(boxes, scores, args.nms_thr, score_thr),
+            args.repeat)
+        valid = int((scores > score_thr).sum())
+        print(f'{score_thr:>9} {valid:>7} {t_legacy:>12.2f} '
+              f'{t_exact:>11.2f} {t_topk:>11.2f} '
+              f'{t_legacy / t_exact:>7.1f}x {t_legacy / t_topk:>7.1f}x '
+              f'{str(same):>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+'''
+Latency and keypoint drift of the INT8 quantized models against fp32.
+
+Builds a solution twice, fp32 and with `quantized=True`, and runs both on
+local frames. Pose drift is measured on the boxes of the fp32 detector, so
+it only reflects the pose model; detector drift is reported separately as
+the IoU of each fp32 box with its best quantized match. Quantize the models
+first (statically calibrated) with `python -m rtmlib.tools.quantization`,
+otherwise they are dynamically quantized on first use.
+
+Example:
+
+python benchmarks/bench_quantized.py --mode balanced --frames ./squat.mp4
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rtmlib  # noqa: E402
+from rtmlib.tools.quantization import load_frames  # noqa: E402
+
+
+def box_iou(boxes_a, boxes_b):
+    # pairwise IoU of two sets of xyxy boxes in shape (M, N), pixel (+1)
+    # convention as in NMS
+    areas_a = (boxes_a[:, 2] - boxes_a[:, 0] + 1) * \
+        (boxes_a[:, 3] - boxes_a[:, 1] + 1)
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0] + 1) * \
+        (boxes_b[:, 3] - boxes_b[:, 1] + 1)
+
+    xx1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    yy1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    xx2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    yy2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    w = np.maximum(0.0, xx2 - xx1 + 1)
+    h = np.maximum(0.0, yy2 - yy1 + 1)
+    inter = w * h
+    return inter / (areas_a[:, None] + areas_b[None, :] - inter)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def build(args, quantized):
+    kwargs = dict(mode=args.mode, quantized=quantized)
+    if args.det is not None:
+        kwargs.update(det=args.det, det_input_size=tuple(args.det_input_size))
+    if args.pose is not None:
+        kwargs.update(pose=args.pose,
+                      pose_input_size=tuple(args.pose_input_size))
+    return getattr(rtmlib, args.solution)(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--solution', default='Body')
+    parser.add_argument('--mode', default='balanced')
+    parser.add_argument('--det', default=None, help='fp32 detector onnx')
+    parser.add_argument('--det-input-size', type=int, nargs=2,
+                        default=(640, 640))
+    parser.add_argument('--pose', default=None, help='fp32 pose onnx')
+    parser.add_argument('--pose-input-size', type=int, nargs=2,
+                        default=(192, 256))
+    parser.add_argument('--frames', default=None,
+                        help='video or image directory, random if not given')
+    parser.add_argument('--num-frames', type=int, default=32)
+    parser.add_argument('--kpt-thr', type=float, default=0.3)
+    args = parser.parse_args()
+
+    if args.frames is not None:
+        frames = load_frames(args.frames, args.num_frames)
+    else:
+        print('no --frames given, drift on random frames is meaningless')
+        frames = [
+            np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+            for _ in range(args.num_frames)
+        ]
+
+    fp32 = build(args, quantized=False)
+    int8 = build(args, quantized=True)
+
+    times = {'det fp32': [], 'det int8': [], 'pose fp32': [], 'pose int8': []}
+    ious, drifts, rel_drifts, score_diffs = [], [], [], []
+    for frame in frames:
+        bboxes, t = timed(fp32.det_model, frame)
+        times['det fp32'].append(t)
+        bboxes_q, t = timed(int8.det_model, frame)
+        times['det int8'].append(t)
+        if len(bboxes) > 0 and len(bboxes_q) > 0:
+            ious.extend(box_iou(bboxes, bboxes_q).max(axis=1))
+        elif len(bboxes) > 0:
+            ious.extend([0.] * len(bboxes))
+        if len(bboxes) == 0:
+            bboxes = [[0, 0, frame.shape[1], frame.shape[0]]]
+        bboxes = np.asarray(bboxes)
+
+        (kpts, scores), t = timed(fp32.pose_model, frame, bboxes=bboxes)
+        times['pose fp32'].append(t)
+        (kpts_q, scores_q), t = timed(int8.pose_model, frame, bboxes=bboxes)
+        times['pose int8'].append(t)
+
+        valid = scores > args.kpt_thr
+        dist = np.linalg.norm(kpts - kpts_q, axis=-1)
+        diag = np.hypot(bboxes[:, 2] - bboxes[:, 0],
+                        bboxes[:, 3] - bboxes[:, 1])[:, None]
+        drifts.extend(dist[valid])
+        rel_drifts.extend((dist / diag)[valid])
+        score_diffs.extend(np.abs(scores - scores_q).ravel())
+
+    # the first call of each model includes warmup
+    print(f'{len(frames)} frames')
+    print(f'{"model":>10} {"mean (ms)":>10} {"p50 (ms)":>9}')
+    for name, values in times.items():
+        values = values[1:] or values
+        print(f'{name:>10} {np.mean(values):>10.2f} '
+              f'{np.median(values):>9.2f}')
+    for stage in ('det', 'pose'):
+        speedup = np.mean(times[f'{stage} fp32'][1:] or times[f'{stage} fp32']) \
+            / np.mean(times[f'{stage} int8'][1:] or times[f'{stage} int8'])
+        print(f'{stage} speedup: {speedup:.2f}x')
+
+    if ious:
+        print(f'det box IoU fp32 vs int8: mean {np.mean(ious):.3f}, '
+              f'min {np.min(ious):.3f}')
+    if drifts:
+        print(f'keypoint drift (score > {args.kpt_thr}): '
+              f'mean {np.mean(drifts):.2f} px, '
+              f'p95 {np.percentile(drifts, 95):.2f} px, '
+              f'max {np.max(drifts):.2f} px, '
+              f'mean {np.mean(rel_drifts) * 100:.2f}% of bbox diagonal')
+    print(f'keypoint score diff: mean {np.mean(score_diffs):.4f}, '
+          f'max {np.max(score_diffs):.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+'''
+Per-frame RTMPose latency against the number of people in the frame.
+
+Compares running one `session.run` per person (the old per-bbox loop) with
+the batched path, where all crops go through the model in one run.
+
+Example:
+
+python benchmarks/bench_rtmpose_batch.py --mode balanced --max-persons 8
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtmlib import Body, RTMPose  # noqa: E402
+
+
+def make_bboxes(num_persons, width, height):
+    """Spread `num_persons` person-sized boxes across the frame."""
+    box_w = width / (num_persons + 1)
+    bboxes = []
+    for i in range(num_persons):
+        x1 = i * box_w + box_w * 0.5
+        bboxes.append([x1, height * 0.1, x1 + box_w, height * 0.9])
+    return np.array(bboxes)
+
+
+def time_call(fn, repeat, warmup=3):
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pose', default=None,
+                        help='RTMPose onnx file or url, overrides --mode')
+    parser.add_argument('--mode', default='balanced',
+                        choices=list(Body.MODE.keys()))
+    parser.add_argument('--backend', default='onnxruntime')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--max-persons', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pose = args.pose or Body.MODE[args.mode]['pose']
+    pose_input_size = Body.MODE[args.mode]['pose_input_size']
+    model = RTMPose(pose,
+                    model_input_size=pose_input_size,
+                    backend=args.backend,
+                    device=args.device)
+    print(f'model batch size: {model.batch_size or "dynamic"}')
+
+    height, width = 1080, 1920
+    frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+
+    print(f'{"persons":>8} {"per-bbox (ms)":>14} {"batched (ms)":>13} '
+          f'{"speedup":>8}')
+    for num_persons in range(1, args.max_persons + 1):
+        bboxes = make_bboxes(num_persons, width, height)
+
+        def per_bbox():
+            for bbox in bboxes:
+                model(frame, bboxes=[bbox])
+
+        def batched():
+            model(frame, bboxes=bboxes)
+
+        t_loop = time_call(per_bbox, args.repeat)
+        t_batch = time_call(batched, args.repeat)
+        print(f'{num_persons:>8} {t_loop:>14.2f} {t_batch:>13.2f} '
+              f'{t_loop / t_batch:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+'''
+Offline video throughput of frame-by-frame against multi-frame batches.
+
+Runs a solution over the same frames once per frame (`solution(frame)`) and
+in batches of K frames (`solution.predict_batch(frames)`), where the
+detector or RTMO sees K letterboxed frames in one run. Models exported with
+a fixed batch size are run in chunks, so they only gain from the batched
+preprocessing and the pose stage.
+
+Example:
+
+python benchmarks/bench_video_batch.py --mode balanced --frames ./squat.mp4 \
+    --batch-sizes 1 4 8 16
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rtmlib  # noqa: E402
+from rtmlib.tools.quantization import load_frames  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--solution', default='Body')
+    parser.add_argument('--mode', default='balanced')
+    parser.add_argument('--det', default=None, help='local detector onnx')
+    parser.add_argument('--det-input-size', type=int, nargs=2,
+                        default=(640, 640))
+    parser.add_argument('--pose', default=None, help='local pose onnx')
+    parser.add_argument('--pose-input-size', type=int, nargs=2,
+                        default=(192, 256))
+    parser.add_argument('--frames', default=None,
+                        help='video or image directory, random if not given')
+    parser.add_argument('--num-frames', type=int, default=64)
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=(1, 4, 8, 16))
+    args = parser.parse_args()
+
+    kwargs = dict(mode=args.mode)
+    if args.det is not None:
+        kwargs.update(det=args.det, det_input_size=tuple(args.det_input_size))
+    if args.pose is not None:
+        kwargs.update(pose=args.pose,
+                      pose_input_size=tuple(args.pose_input_size))
+    solution = getattr(rtmlib, args.solution)(**kwargs)
+    model = solution.pose_model if solution.one_stage else solution.det_model
+    print(f'{type(model).__name__} batch size: '
+          f'{model.batch_size or "dynamic"}')
+
+    if args.frames is not None:
+        frames = load_frames(args.frames, args.num_frames)
+    else:
+        frames = [
+            np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+            for _ in range(args.num_frames)
+        ]
+
+    # warmup
+    solution(frames[0])
+    solution.predict_batch(frames[:max(args.batch_sizes)])
+
+    start = time.perf_counter()
+    for frame in frames:
+        solution(frame)
+    base = len(frames) / (time.perf_counter() - start)
+
+    print(f'{len(frames)} frames')
+    print(f'{"batch":>6} {"fps":>8} {"speedup":>8}')
+    print(f'{"frame":>6} {base:>8.2f} {1.:>7.2f}x')
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            solution.predict_batch(frames[i:i + batch_size])
+        fps = len(frames) / (time.perf_counter() - start)
+        print(f'{batch_size:>6} {fps:>8.2f} {fps / base:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
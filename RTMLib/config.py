@@ -31,6 +31,26 @@ SQUAT_DEPTH_ANGLE_THRESHOLD = 95 # Angle in degrees (e.g., less than 95 means be
 # This is a placeholder - proper valgus detection is complex from side view.
 KNEE_VALGUS_THRESHOLD = 10 # Example threshold for angle deviation
 
+# --- Two-pass Analysis ---
+# The coarse pass looks for frames where the knee bends this much more than when standing
+MOTION_ANGLE_MARGIN = 20 # Degrees below the standing knee angle
+MOTION_WINDOW_PADDING = 0.5 # Seconds added before and after every motion window
+COARSE_ANALYSIS_FPS = 5 # Frames per second analyzed by the coarse pass
+
+# --- Motion Gate ---
+# Frames where the subject did not move since the last analyzed frame reuse its keypoints
+MOTION_GATE_THRESHOLD = 0.02 # Fraction of pixels in the subject's box that must change
+MOTION_GATE_PIXEL_DELTA = 12 # Gray level difference for a pixel to count as changed
+MOTION_GATE_THUMB_WIDTH = 160 # Width of the grayscale thumbnails that are compared
+MOTION_GATE_MAX_SKIP = 30 # Analyze at least every N-th frame even if nothing moves
+
+# --- Subject Lock ---
+SUBJECT_IOU_THRESHOLD = 0.3 # Minimum overlap of a detection with the subject's last box to keep following it
+ROI_EXPANSION = 2.0 # Size of the re-detection crop relative to the subject's box
+ROI_DETECTION_INPUT_SIZE = (320, 320) # Detector input size on the crops, if the model allows other sizes
+ROI_FULL_DETECTION_INTERVAL = 10 # Search the full frame on every N-th detection (0 = only when the subject is lost)
+ROI_CROP_ALIGN = 32 # Crop sizes are rounded up to multiples of this, the detector caches its buffers per size
+
 # --- Thresholds ---
 KEYPOINT_CONFIDENCE_THRESHOLD = 0.3 # Minimum score to consider a keypoint valid
 
@@ -0,0 +1,56 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class FrameRing:
+    """
+    Fixed number of frame slots in one shared memory block.
+
+    The decoder writes frames straight into the slots and worker processes read them as
+    numpy views, so only slot indices and small metadata cross process boundaries instead
+    of pickling every frame. Which slots are free is tracked by the owner (the decoding
+    process), workers only ever look at the slots they are handed.
+
+    Args:
+        num_slots (int): Number of frames the ring holds.
+        frame_shape (tuple): Shape of every frame, e.g. (1080, 1920, 3).
+        dtype (str): Data type of the frames.
+        name (str, optional): Name of an existing block to attach to, see `spec`.
+            A new block is created when not given.
+    """
+
+    def __init__(self, num_slots, frame_shape, dtype="uint8", name=None):
+        self.num_slots = int(num_slots)
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        size = self.num_slots * int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((self.num_slots, *self.frame_shape), dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def spec(self):
+        """Picklable arguments to attach to this ring from another process: FrameRing(*spec)."""
+        return (self.num_slots, self.frame_shape, self.dtype.str, self.shm.name)
+
+    def view(self, slot):
+        """
+        Returns the frame of a slot as a numpy view into the shared memory.
+
+        Args:
+            slot (int): Slot index.
+
+        Returns:
+            np.ndarray: Writable view of shape `frame_shape`, valid until `close`.
+        """
+        return self.frames[slot]
+
+    def close(self):
+        """Detaches from the shared memory, the owner also frees it."""
+        self.frames = None # Views must be gone before the buffer can be released
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
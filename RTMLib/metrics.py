@@ -1,3 +1,4 @@
+import numpy as np
 import config
 from utils import calculate_angle, is_valid_keypoint
 
@@ -70,6 +71,50 @@ def analyze_squat(keypoints, scores):
     metrics['feedback'] = "Analysis Complete" # General feedback if processing happened
     return metrics
 
+def find_motion_windows(knee_angles, fps, angle_margin=config.MOTION_ANGLE_MARGIN,
+                        padding=config.MOTION_WINDOW_PADDING):
+    """
+    Finds the parts of a squat video where the lifter is moving, from a knee-angle signal.
+
+    The standing angle is taken as the 90th percentile of the signal; frames bending more than
+    `angle_margin` below it are active. Each run of active frames is one rep, its lowest angle a
+    candidate rep bottom.
+
+    Args:
+        knee_angles (np.ndarray): Knee angle per frame, NaN where it is unknown.
+        fps (float): FPS of the video, for the padding.
+        angle_margin (float): Degrees below the standing angle that count as moving.
+        padding (float): Seconds added before and after every window.
+
+    Returns:
+        tuple: (list of (start, stop) frame ranges, stop exclusive, sorted and not overlapping,
+                list of frame indices of the candidate rep bottoms).
+               The whole video is one window when the signal has no valid angle.
+    """
+    knee_angles = np.asarray(knee_angles, dtype=float)
+    num_frames = len(knee_angles)
+    valid = ~np.isnan(knee_angles)
+    if not valid.any():
+        return [(0, num_frames)], []
+
+    standing_angle = np.percentile(knee_angles[valid], 90)
+    active = valid & (knee_angles < standing_angle - angle_margin)
+
+    # Runs of active frames, as [start, stop) pairs
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], active.astype(np.int8), [0]])))
+    runs = edges.reshape(-1, 2)
+    bottoms = [int(start + np.nanargmin(knee_angles[start:stop])) for start, stop in runs]
+
+    pad = int(round(padding * fps))
+    windows = []
+    for start, stop in runs:
+        start, stop = max(0, start - pad), min(num_frames, stop + pad)
+        if windows and start <= windows[-1][1]: # Merge with the previous window
+            windows[-1] = (windows[-1][0], max(windows[-1][1], stop))
+        else:
+            windows.append((int(start), int(stop)))
+    return windows, bottoms
+
 # --- Add functions for Deadlift and Bench Press analysis later ---
 # def analyze_deadlift(keypoints, scores):
 #     metrics = {}
@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+from rtmlib.tools.solution.pose_tracker import pose_to_bbox
+import config
+
+
+class MotionGate:
+    """
+    Cheap check whether the subject moved since the last analyzed frame.
+
+    Every frame is shrunk to a small grayscale thumbnail and compared with the thumbnail of the
+    last frame that went through the models, inside the subject's last bounding box. When only
+    a small fraction of those pixels changed, the frame is static and its keypoints can be reused.
+    Comparing with the last analyzed frame instead of the previous one means slow movement still
+    adds up until it passes the threshold.
+
+    Frames are checked and the subject is set from the same thread, also in pipelined mode, so a
+    video skips the same frames however it is processed.
+
+    Args:
+        threshold (float): Fraction of pixels in the box that must change to count as motion.
+        pixel_delta (int): Gray level difference for a pixel to count as changed.
+        thumb_width (int): Width of the thumbnails, the height keeps the aspect ratio.
+        max_skip (int): Static frames in a row after which a frame is analyzed anyway.
+    """
+
+    def __init__(self, threshold=config.MOTION_GATE_THRESHOLD, pixel_delta=config.MOTION_GATE_PIXEL_DELTA,
+                 thumb_width=config.MOTION_GATE_THUMB_WIDTH, max_skip=config.MOTION_GATE_MAX_SKIP):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.thumb_width = thumb_width
+        self.max_skip = max_skip
+        self.reset()
+
+    def reset(self):
+        """Forgets the last analyzed frame and subject, call at the start of every video."""
+        self.reference = None # Thumbnail of the last analyzed frame
+        self.region = None # (x1, y1, x2, y2) of the subject in thumbnail pixels, None = whole frame
+        self.scale = 1.0 # Thumbnail pixels per frame pixel
+        self.num_skipped = 0 # Static frames in a row
+
+    def set_subject(self, keypoints, scores, kpt_thr=config.KEYPOINT_CONFIDENCE_THRESHOLD):
+        """
+        Restricts the comparison to the box around the analyzed person of the last analyzed frame.
+
+        Args:
+            keypoints (np.ndarray): Keypoints of all detected people, (N, 17, 2).
+            scores (np.ndarray): Keypoint scores of all detected people, (N, 17).
+            kpt_thr (float): Minimum score of the keypoints the box is fitted to.
+        """
+        box = None
+        if len(keypoints) > 0:
+            visible = keypoints[0][scores[0] > kpt_thr]
+            if len(visible) >= 2:
+                box = pose_to_bbox(visible)
+        region = None
+        if box is not None:
+            x1, y1, x2, y2 = box * self.scale
+            region = (max(0, int(x1)), max(0, int(y1)), int(np.ceil(x2)) + 1, int(np.ceil(y2)) + 1)
+        self.region = region
+
+    def is_static(self, frame):
+        """
+        Checks a frame against the last analyzed one, which it replaces when the frame is not static.
+
+        Args:
+            frame (np.ndarray): BGR frame.
+
+        Returns:
+            bool: True if the subject did not move, the frame's analysis can be skipped.
+        """
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.thumb_width / w)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        # Shrink before the color conversion, INTER_AREA also averages out sensor noise
+        thumb = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+        self.scale = scale
+        static = False
+        if self.reference is not None and self.reference.shape == thumb.shape and self.num_skipped < self.max_skip:
+            if self.region is None:
+                diff = cv2.absdiff(thumb, self.reference)
+            else:
+                x1, y1, x2, y2 = self.region
+                diff = cv2.absdiff(thumb[y1:y2, x1:x2], self.reference[y1:y2, x1:x2])
+            static = diff.size == 0 or bool(np.count_nonzero(diff > self.pixel_delta) < self.threshold * diff.size)
+
+        if static:
+            self.num_skipped += 1
+        else:
+            self.reference = thumb
+            self.num_skipped = 0
+        return static
@@ -0,0 +1,121 @@
+import queue
+import threading
+
+_DONE = object() # Marks the end of the stream in every queue
+
+
+class _StageError:
+    """Carries an exception raised in a stage thread to the consumer."""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class Pipeline:
+    """
+    Runs a chain of stages on their own threads, connected by bounded queues.
+
+    Each stage maps one item to one item and runs on a single thread, so items come
+    out in the order the source produced them. Stages that release the GIL (cv2
+    decoding, ONNX Runtime inference, drawing) overlap, which makes the wall-clock
+    time close to the slowest stage instead of the sum of all stages. The bounded
+    queues keep at most `queue_size` items waiting between two stages.
+
+    Args:
+        source (iterable): Produces the items, iterated on its own thread.
+        stages (list): (name, function) pairs applied in order to every item.
+        queue_size (int): Capacity of each queue between two stages.
+        source_name (str): Name of the source stage in `queue_depths`.
+    """
+
+    def __init__(self, source, stages, queue_size=4, source_name="decode"):
+        self.source = source
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.names = [source_name] + [name for name, _ in stages]
+        # queues[i] holds the output of stage i (the source is stage 0)
+        self.queues = [queue.Queue(maxsize=self.queue_size) for _ in self.names]
+        self._stop = threading.Event()
+        self._threads = []
+
+    def queue_depths(self):
+        """
+        Returns the number of items waiting after each stage.
+
+        A stage whose output queue stays full is faster than the next one, the
+        stage after the last full queue is the bottleneck.
+
+        Returns:
+            dict: {stage name: items in its output queue}
+        """
+        return {name: q.qsize() for name, q in zip(self.names, self.queues)}
+
+    def _put(self, q, item):
+        # Give up when the consumer stopped, instead of blocking on a full queue forever
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _run_source(self):
+        out = self.queues[0]
+        try:
+            for item in self.source:
+                if not self._put(out, item):
+                    return
+        except Exception as e:
+            self._put(out, _StageError(e))
+        self._put(out, _DONE)
+
+    def _run_stage(self, fn, inp, out):
+        while True:
+            item = self._get(inp)
+            if item is _DONE or isinstance(item, _StageError):
+                self._put(out, item) # Forward the end or the error downstream
+                return
+            try:
+                item = fn(item)
+            except Exception as e:
+                self._put(out, _StageError(e))
+                return
+            if not self._put(out, item):
+                return
+
+    def __iter__(self):
+        threads = [threading.Thread(target=self._run_source, name=f"pipeline-{self.names[0]}", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage, args=(fn, self.queues[i], self.queues[i + 1]),
+                                            name=f"pipeline-{name}", daemon=True))
+        self._threads = threads
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(self.queues[-1])
+                if item is _DONE:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.exc
+                yield item
+        finally:
+            # Also runs when the consumer stops early or a stage failed
+            self.close()
+
+    def close(self):
+        """Stops all stage threads and waits for them to exit."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
@@ -1,11 +1,98 @@
 import cv2
+import collections
+import copy
+import functools
+import multiprocessing
+import os
+import queue
 import time
-from rtmlib import Body, draw_skeleton # Make sure rtmlib is in the same directory or Python path
+from rtmlib import Body, PoseTracker, SessionConfig, draw_skeleton # Make sure rtmlib is in the same directory or Python path
 import config
-from metrics import analyze_squat # Import analysis function
+import numpy as np
+from metrics import analyze_squat, find_motion_windows # Import analysis functions
+from frame_ring import FrameRing
+from motion_gate import MotionGate
+from subject_lock import SubjectLock
+from pipeline import Pipeline
+
+_worker_processor = None # VideoProcessor of a worker process
+
+
+def _init_worker(kwargs):
+    global _worker_processor
+    _worker_processor = VideoProcessor(**kwargs)
+
+
+def _process_range(args):
+    # Runs in a worker process, returns the outputs of the frames in [start, stop)
+    video_path, start, stop, overlap, render, stride = args
+    processor = _worker_processor
+    processor._start_video()
+    warm_start = max(0, start - overlap)
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, warm_start)
+    outputs = []
+    try:
+        for batch in processor._read_batches(cap, start=warm_start, stop=stop, stride=stride):
+            for frame_idx, frame_metrics, frame, keypoints, scores in processor._analyze_batch(processor._infer_batch(batch)):
+                if frame_idx >= start: # Overlap frames only warm up state
+                    send = render is True or (render and is_export_frame(frame_idx, render, stride))
+                    outputs.append((frame_idx, frame_metrics, frame if send else None, keypoints, scores))
+    finally:
+        cap.release()
+    return outputs
+
+
+def is_export_frame(frame_idx, interval, stride=1):
+    """
+    Checks whether an analyzed frame is the first one at or after a multiple of interval.
+
+    This is the frame kept when a video analyzed every `stride` frames is exported at one frame
+    every `interval` video frames, with interval >= stride.
+
+    Args:
+        frame_idx (int): Index of an analyzed frame.
+        interval (float): Video frames between two exported frames.
+        stride (int): Video frames between two analyzed frames.
+
+    Returns:
+        bool: True if the frame is exported.
+    """
+    return frame_idx // interval > (frame_idx - stride) // interval
+
+
+def _ring_frame(ring, generations, slot, generation):
+    # Frame of a ring slot for a render function, only while the slot still holds that frame
+    if ring.frames is None or generations[slot] != generation:
+        raise RuntimeError("Frame rendered after its shared-memory slot was reused or released, "
+                           "call the render function before requesting the next frame")
+    return ring.view(slot)
+
+
+def _ring_worker(kwargs, ring_spec, tasks, results):
+    # Runs in a worker process: estimates poses on the ring slots it is handed
+    processor = VideoProcessor(**kwargs)
+    ring = FrameRing(*ring_spec)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, seq = task
+            start_time = time.time()
+            try:
+                keypoints, scores = processor.pose_model(ring.view(slot))
+                results.put((slot, seq, keypoints, scores, time.time() - start_time))
+            except Exception as e:
+                results.put((slot, seq, None, str(e), 0.0))
+    finally:
+        ring.close()
+
 
 class VideoProcessor:
-    def __init__(self, device='cpu', backend='onnxruntime', mode='balanced'):
+    def __init__(self, device='cpu', backend='onnxruntime', mode='balanced', session_config=None, quantized=False,
+                 batch_size=1, pipelined=False, queue_size=4, target_analysis_fps=None, motion_gate=False,
+                 det_frequency=1, tracking=False, subject_lock=None, roi_detection=False):
         """
         Initializes the pose estimation model.
 
@@ -13,8 +100,42 @@ class VideoProcessor:
             device (str): Device to run inference on ('cpu', 'cuda', 'mps').
             backend (str): Inference backend ('onnxruntime', 'opencv', 'openvino').
             mode (str): Model performance mode ('lightweight', 'balanced', 'performance').
+            session_config (SessionConfig, optional): Runtime options (threads, execution mode,
+                graph optimization, memory arena, spinning) shared by all model sessions.
+            quantized (bool): Use INT8 quantized models (CPU speedup, small keypoint drift).
+            batch_size (int): Frames decoded ahead and run through the detector and pose
+                model in one batch. Offline video only, 1 = frame by frame.
+            pipelined (bool): Run decoding, detection, pose estimation and analysis on separate
+                threads connected by bounded queues.
+            queue_size (int): Batches each pipelined stage may queue for the next one.
+            target_analysis_fps (float, optional): Run pose estimation on about this many
+                frames per second of video. The frames in between are skipped without being
+                decoded, their keypoints and metrics are interpolated. None = every frame.
+            motion_gate (bool): Skip the models on frames where the subject did not move since the
+                last analyzed frame and reuse its keypoints, see `MotionGate`. Pipelined runs then
+                detect in the pose stage, so they skip the same frames as sequential ones. Not used
+                by `stream_video_shared`, whose workers see the frames out of order.
+            det_frequency (int): Run the detector on every N-th analyzed frame. In between, the
+                boxes are propagated from the previous keypoints (`PoseTracker`). 1 = every frame.
+            tracking (bool): Follow people across frames by box overlap, so the analyzed person
+                (the first one) stays the same person. Frames go through the models one by one
+                when det_frequency > 1 or tracking is on.
+            subject_lock (str | tuple, optional): Pick one lifter ('largest', 'central', or an
+                (x, y) point as fractions of the frame, e.g. a click) and run the pose model on
+                that person's box only, see `SubjectLock`. Uses det_frequency, replaces tracking.
+                Parallel ranges and two-pass windows each pick the subject again.
+            roi_detection (bool): With subject_lock, re-detect the subject on a crop around its
+                last box, at a smaller detector input size when the model allows it. The full
+                frame is searched periodically and whenever the subject is not in the crop.
         """
-        print(f"Initializing RTMLib Body model with backend: {backend}, device: {device}, mode: {mode}")
+        if session_config is None:
+            session_config = SessionConfig()
+        # Everything needed to build the same processor again in a worker process
+        self.init_kwargs = dict(device=device, backend=backend, mode=mode, session_config=session_config,
+                                quantized=quantized, batch_size=batch_size, target_analysis_fps=target_analysis_fps,
+                                motion_gate=motion_gate, det_frequency=det_frequency, tracking=tracking,
+                                subject_lock=subject_lock, roi_detection=roi_detection)
+        print(f"Initializing RTMLib Body model with backend: {backend}, device: {device}, mode: {mode}, quantized: {quantized}, batch size: {batch_size}, {session_config}")
         try:
             self.pose_model = Body(
                 # Use pose='rtmo' explicitly if you want the one-stage model like in squat.py
@@ -22,136 +143,787 @@ class VideoProcessor:
                 to_openpose=False, # Use COCO-17 format
                 mode=mode,
                 backend=backend,
-                device=device
+                device=device,
+                session_config=session_config,
+                quantized=quantized
             )
             print("RTMLib Body model initialized successfully.")
         except Exception as e:
             print(f"Error initializing RTMLib model: {e}")
             raise
 
+        if roi_detection and subject_lock is None:
+            raise ValueError("ROI detection searches around the locked subject, it needs subject_lock")
+        if subject_lock is not None and self.pose_model.one_stage:
+            raise ValueError("Subject lock needs a detector, it does not work with one-stage pose models")
+        self.roi_det_model = None # Detector of the crops around the locked subject
+        if roi_detection:
+            self.roi_det_model = self.pose_model.det_model
+            if self.roi_det_model.has_dynamic_input_size():
+                self.roi_det_model = self.roi_det_model.with_input_size(config.ROI_DETECTION_INPUT_SIZE)
+            else:
+                print("The detector has a fixed input size, the crops around the subject are detected at full size.")
+
         self.keypoint_confidence_threshold = config.KEYPOINT_CONFIDENCE_THRESHOLD
+        self.batch_size = max(1, int(batch_size)) # Frames per model run
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        self.target_analysis_fps = target_analysis_fps
+        self.coarse_processors = {} # Lightweight processors of the two-pass mode by fps, built on first use
         self.frame_data = [] # To store data per frame
+        self._init_video_state()
 
-    def process_video(self, video_path):
+    def _init_video_state(self):
+        # State carried from frame to frame of one video, see new_session
+        options = self.init_kwargs
+        self.tracker = None # PoseTracker or SubjectLock, frames then go through the models one by one
+        if options['subject_lock'] is not None:
+            self.tracker = SubjectLock(self.pose_model.det_model, self.pose_model.pose_model, subject=options['subject_lock'],
+                                       det_frequency=options['det_frequency'], roi_det_model=self.roi_det_model)
+        elif options['det_frequency'] > 1 or options['tracking']:
+            # Shares the models of pose_model instead of loading them again
+            self.tracker = PoseTracker.from_solution(self.pose_model, det_frequency=int(options['det_frequency']),
+                                                     tracking=options['tracking'])
+        self.motion_gate = MotionGate() if options['motion_gate'] else None
+        self.last_results = None # (keypoints, scores) of the last frame that went through the models
+        self.pipeline = None # Pipeline of the last pipelined run, for queue depths
+
+    def new_session(self):
         """
-        Processes the video file, performs pose estimation, and calculates metrics.
+        Returns a processor sharing this one's models, with its own per-video state.
+
+        A processor handles one video at a time: the tracker, motion gate and pipeline carry
+        state from frame to frame. Loading the models is the expensive part, so build them
+        once and give every concurrent user (e.g. every Streamlit session) its own session.
+        The models lock their reused buffers, sessions can run on different threads.
+
+        Returns:
+            VideoProcessor: Processor with the same options and models and a fresh state.
+        """
+        session = copy.copy(self)
+        session.frame_data = []
+        session._init_video_state()
+        return session
+
+    def get_video_fps(self, video_path):
+        """
+        Reads the frame rate of a video file.
 
         Args:
             video_path (str): Path to the input video file.
 
         Returns:
-            tuple: (list of processed frames, list of metrics per frame)
-                   Returns (None, None) if video cannot be opened.
+            float | None: FPS of the video (10 if it cannot be read),
+                          or None if the video cannot be opened.
         """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             print(f"Error: Could not open video file: {video_path}")
-            return None, None, 0 # Return 0 fps on error
-        
-        # <<< Get video FPS >>>
+            return None
         fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
         if fps == 0: # Handle case where FPS might not be readable
             print("Warning: Could not read video FPS. Defaulting GIF duration.")
             fps = 10 # Default to 10 FPS if unknown
+        return fps
 
-        processed_frames_rgb = [] # Store frames in RGB format
-        all_frame_metrics = []
-        frame_idx = 0
+    def get_analysis_stride(self, fps):
+        """
+        Returns how many video frames there are per analyzed frame.
 
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
-                break
+        Args:
+            fps (float): FPS of the video.
 
-            start_time = time.time()
+        Returns:
+            int: 1 to analyze every frame, N to analyze every N-th frame.
+        """
+        if not self.target_analysis_fps or not fps:
+            return 1
+        return max(1, int(round(fps / self.target_analysis_fps)))
 
-            # --- Pose Estimation ---
-            try:
-                # Assuming model returns keypoints for multiple people, take the first one
-                keypoints, scores = self.pose_model(frame)
-            except Exception as e:
-                print(f"Error during pose model inference on frame {frame_idx}: {e}")
-                # Optionally add a placeholder frame or skip
-                # processed_frames_rgb.append(frame) # Add original frame on error
-                all_frame_metrics.append({'frame': frame_idx, 'feedback': 'Inference Error'})
+    def stream_video(self, video_path):
+        """
+        Processes the video file frame by frame, yielding each frame as soon as it is done.
+
+        Only the frames of the current batches are held in memory, so memory stays bounded
+        however long the video is. With `pipelined`, decoding, detection, pose estimation
+        and analysis run on their own threads, see `get_queue_depths`.
+
+        Frames are only analyzed, not drawn: each comes with a render function that draws the
+        skeleton and metrics when called, so frames that are never shown or exported cost
+        nothing to draw. Call it before asking for the next frame, the decoded frame it draws
+        on may be reused afterwards.
+
+        Args:
+            video_path (str): Path to the input video file.
+
+        Yields:
+            tuple: (frame index, metrics dict of the frame, render function). Calling the
+                   render function returns the annotated RGB frame. It is None if inference
+                   failed on the frame, or if the frame was skipped by `target_analysis_fps`
+                   (its metrics are interpolated).
+                   With `motion_gate`, static frames are marked with 'motion_skipped'.
+                   Nothing is yielded if the video cannot be opened.
+        """
+        return self._fill_skipped(self._stream_video(video_path))
+
+    def _stream_video(self, video_path):
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file: {video_path}")
+            return
+        stride = self.get_analysis_stride(cap.get(cv2.CAP_PROP_FPS))
+        self._start_video()
+
+        num_frames = 0
+        num_static = 0
+        try:
+            if self.pipelined:
+                batches = self._stream_pipelined(cap, stride)
+            else:
+                batches = (self._analyze_batch(self._infer_batch(batch)) for batch in self._read_batches(cap, stride=stride))
+            for outputs in batches:
+                for output in outputs:
+                    yield output
+                    if output[1] is not None: # Not the end of video marker
+                        num_frames += 1
+                        num_static += bool(output[1].get('motion_skipped'))
+        finally:
+            # Also runs when the consumer stops early
+            if self.pipelined and self.pipeline is not None:
+                self.pipeline.close()
+            cap.release()
+
+        print(f"Video processing complete. Analyzed {num_frames} frames.")
+        self._report_motion_gate(num_static, num_frames)
+
+    def stream_video_parallel(self, video_path, num_workers=None, chunk_size=120, overlap=8, render=True, max_in_flight=None):
+        """
+        Processes the video in frame ranges spread over worker processes, yielding frames in order.
+
+        Each worker builds its own models, seeks to its range with CAP_PROP_POS_FRAMES and
+        starts `overlap` frames early so temporal state is warmed up at the range boundary;
+        the overlap frames are dropped. With stateless settings the merged stream matches
+        `stream_video` frame for frame. With det_frequency > 1, tracking, subject_lock or
+        motion_gate every range restarts that state at its first overlap frame, so frames near
+        range boundaries can differ from `stream_video`.
+
+        At most `max_in_flight` ranges are processed or waiting to be consumed at a time, so
+        memory stays bounded by about max_in_flight * chunk_size frames however slow the
+        consumer is.
+
+        Args:
+            video_path (str): Path to the input video file.
+            num_workers (int, optional): Worker processes. Defaults to the number of cores.
+            chunk_size (int): Frames per range. Smaller ranges bound the memory per worker,
+                larger ones re-process fewer overlap frames.
+            overlap (int): Frames processed before each range and dropped.
+            render (bool | float): Send the decoded frames back so they can be rendered here.
+                A number only sends the frames kept when exporting one frame every `render` video
+                frames (see `is_export_frame`), the others have no render function. Turn off when
+                only the metrics are needed, this saves pickling every frame between processes.
+            max_in_flight (int, optional): Ranges submitted ahead of the one being consumed.
+                Defaults to twice the number of workers.
+
+        Yields:
+            tuple: (frame index, metrics dict of the frame, render function or None),
+                   as `stream_video`.
+        """
+        return self._fill_skipped(self._stream_video_parallel(video_path, num_workers, chunk_size, overlap, render, max_in_flight))
+
+    def _stream_video_parallel(self, video_path, num_workers, chunk_size, overlap, render, max_in_flight):
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file: {video_path}")
+            return
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        stride = self.get_analysis_stride(cap.get(cv2.CAP_PROP_FPS))
+        cap.release()
+
+        num_workers = num_workers or os.cpu_count() or 1
+        chunk_size = max(1, int(chunk_size))
+        starts = list(range(0, max(total_frames, 1), chunk_size))
+        # The frame count can be off, the last range runs to the end of the video
+        ranges = [(video_path, start, start + chunk_size if i < len(starts) - 1 else None, overlap, render, stride)
+                  for i, start in enumerate(starts)]
+
+        # Split the cores between the workers instead of every session using all of them
+        kwargs = dict(self.init_kwargs)
+        session_config = copy.copy(kwargs['session_config'])
+        if session_config.intra_op_num_threads == 0:
+            session_config.intra_op_num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        kwargs['session_config'] = session_config
+
+        stateful = [name for name, enabled in (("det_frequency > 1", kwargs['det_frequency'] > 1),
+                                               ("tracking", kwargs['tracking']),
+                                               ("subject_lock", kwargs['subject_lock'] is not None),
+                                               ("motion_gate", kwargs['motion_gate'])) if enabled]
+        if stateful:
+            print(f"Warning: {', '.join(stateful)} restart every {chunk_size} frames in parallel mode, "
+                  f"frames near range boundaries can differ from sequential processing.")
+
+        num_frames = 0
+        num_static = 0
+        max_in_flight = max(1, max_in_flight or 2 * num_workers)
+        pending = collections.deque() # Results of the submitted ranges, in video order
+        next_range = 0
+        # spawn, forking a process with live ONNX Runtime thread pools can deadlock
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(min(num_workers, len(ranges)), initializer=_init_worker, initargs=(kwargs,)) as pool:
+            while pending or next_range < len(ranges):
+                # Only submit up to max_in_flight ranges ahead, finished ranges would otherwise
+                # pile up here when the consumer is slower than the workers
+                while next_range < len(ranges) and len(pending) < max_in_flight:
+                    pending.append(pool.apply_async(_process_range, (ranges[next_range],)))
+                    next_range += 1
+                outputs = pending.popleft().get()
+                for output in outputs:
+                    yield output
+                    if output[1] is not None: # Not the end of video marker
+                        num_frames += 1
+                        num_static += bool(output[1].get('motion_skipped'))
+                del outputs
+
+        print(f"Video processing complete. Analyzed {num_frames} frames in {len(ranges)} ranges.")
+        self._report_motion_gate(num_static, num_frames)
+
+    def stream_video_shared(self, video_path, num_workers=None, num_slots=None):
+        """
+        Processes the video with pose estimation spread over worker processes, yielding frames in order.
+
+        This process decodes every frame straight into a slot of a shared-memory `FrameRing`,
+        workers read it from there and only send back the keypoints, so frames are never
+        pickled. Analysis and rendering run here on the same slot before it is reused.
+        Workers see the frames out of order, so every frame is detected: `det_frequency`,
+        `tracking`, `subject_lock` and `motion_gate` are not used.
+
+        Args:
+            video_path (str): Path to the input video file.
+            num_workers (int, optional): Inference processes. Defaults to the number of cores.
+            num_slots (int, optional): Frames in flight, bounds the shared memory.
+                Defaults to 4 per worker.
+
+        Yields:
+            tuple: (frame index, metrics dict of the frame, render function or None),
+                   as `stream_video`. The slot of a frame is reused once the next one is requested,
+                   calling its render function after that raises a RuntimeError.
+        """
+        return self._fill_skipped(self._stream_video_shared(video_path, num_workers, num_slots))
+
+    def _stream_video_shared(self, video_path, num_workers, num_slots):
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file: {video_path}")
+            return
+        stride = self.get_analysis_stride(cap.get(cv2.CAP_PROP_FPS))
+        success, first_frame = cap.read()
+        if not success:
+            cap.release()
+            return
+
+        num_workers = num_workers or os.cpu_count() or 1
+        num_slots = num_slots or 4 * num_workers
+        ring = FrameRing(num_slots, first_frame.shape, first_frame.dtype)
+        ring.view(0)[:] = first_frame
+
+        # Split the cores between the workers instead of every session using all of them
+        kwargs = dict(self.init_kwargs)
+        session_config = copy.copy(kwargs['session_config'])
+        if session_config.intra_op_num_threads == 0:
+            session_config.intra_op_num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        kwargs['session_config'] = session_config
+
+        # spawn, forking a process with live ONNX Runtime thread pools can deadlock
+        context = multiprocessing.get_context("spawn")
+        tasks, results = context.Queue(), context.Queue()
+        workers = [context.Process(target=_ring_worker, args=(kwargs, ring.spec, tasks, results), daemon=True)
+                   for _ in range(num_workers)]
+        for worker in workers:
+            worker.start()
+
+        # Analyzed frames are numbered by sequence, results arrive out of order
+        tasks.put((0, 0))
+        frame_indices = {0: 0} # Sequence number -> frame index
+        free_slots = list(range(num_slots - 1, 0, -1))
+        generations = [0] * num_slots # Bumped whenever a slot is freed, invalidates its render functions
+        next_frame = 1 # Index of the next frame of cap
+        next_read = 1 # Sequence number of the next analyzed frame
+        next_yield = 0 # Sequence number of the next frame to hand out
+        done = {}
+        eof = False
+        try:
+            while not eof or next_yield < next_read:
+                # Decode into every free slot
+                while free_slots and not eof:
+                    # Skipped frames are only grabbed, never decoded to BGR
+                    while next_frame % stride and cap.grab():
+                        next_frame += 1
+                    slot = free_slots.pop()
+                    success = next_frame % stride == 0 and cap.read(ring.view(slot))[0] # Decodes in place
+                    if not success:
+                        free_slots.append(slot)
+                        eof = True
+                        break
+                    tasks.put((slot, next_read))
+                    frame_indices[next_read] = next_frame
+                    next_read += 1
+                    next_frame += 1
+                if next_yield == next_read:
+                    break
+
+                while next_yield not in done:
+                    try:
+                        slot, seq, keypoints, scores, inference_time = results.get(timeout=1)
+                    except queue.Empty:
+                        if not all(worker.is_alive() for worker in workers):
+                            raise RuntimeError("A pose estimation worker process died")
+                        continue
+                    done[seq] = (slot, keypoints, scores, inference_time)
+
+                # Analyze the finished frames in order, their slots are freed once the consumer moves on
+                while next_yield in done:
+                    slot, keypoints, scores, inference_time = done.pop(next_yield)
+                    # The frame stays in its slot, only fetched if it is rendered: a render function the
+                    # consumer still holds must not keep the shared memory mapped
+                    frame = functools.partial(_ring_frame, ring, generations, slot, generations[slot])
+                    batch = {'indices': [frame_indices.pop(next_yield)], 'frames': [frame],
+                             'inference_time': inference_time}
+                    if keypoints is None:
+                        batch['error'] = scores
+                    else:
+                        batch['results'] = [(keypoints, scores)]
+                    outputs = self._analyze_batch(batch)
+                    next_yield += 1
+                    yield outputs[0]
+                    generations[slot] += 1
+                    free_slots.append(slot)
+            yield self._end_of_video(next_frame)
+        finally:
+            # Also runs when the consumer stops early
+            for _ in workers:
+                tasks.put(None)
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+            cap.release()
+            ring.close()
+
+        print(f"Video processing complete. Analyzed {next_yield} of {next_frame} frames.")
+
+    def stream_video_two_pass(self, video_path, coarse_fps=config.COARSE_ANALYSIS_FPS):
+        """
+        Processes the video coarse to fine, yielding frames in order once the coarse pass is done.
+
+        The coarse pass runs the 'lightweight' model on `coarse_fps` frames per second of the whole
+        video and finds the motion windows and candidate rep bottoms in the knee-angle signal
+        (`find_motion_windows`). The fine pass then runs this processor's model at its full rate
+        only inside those windows. Setup, walkout and racking keep their coarse metrics.
+
+        Args:
+            video_path (str): Path to the input video file.
+            coarse_fps (float): Frames per second analyzed by the coarse pass.
+
+        Yields:
+            tuple: (frame index, metrics dict of the frame, render function or None),
+                   as `stream_video`. The metrics say which pass they came from in 'pass'
+                   ('coarse' or 'fine') and mark candidate rep bottoms with 'rep_bottom'.
+                   Only fine frames are drawn.
+        """
+        fps = self.get_video_fps(video_path)
+        if fps is None:
+            return
+
+        # --- Coarse pass ---
+        if coarse_fps not in self.coarse_processors: # Shared by the sessions of this processor
+            kwargs = dict(self.init_kwargs, mode='lightweight', target_analysis_fps=coarse_fps)
+            self.coarse_processors[coarse_fps] = VideoProcessor(**kwargs)
+        coarse_processor = self.coarse_processors[coarse_fps].new_session()
+        coarse_metrics = [frame_metrics for _, frame_metrics, _ in coarse_processor.stream_video(video_path)]
+        knee_angles = [m['knee_angle'] if isinstance(m.get('knee_angle'), (int, float, np.floating)) else np.nan
+                       for m in coarse_metrics]
+        windows, bottoms = find_motion_windows(knee_angles, fps)
+        bottoms = set(bottoms)
+        # With target_analysis_fps the fine pass must start on an analyzed frame
+        stride = self.get_analysis_stride(fps)
+        aligned = []
+        for start, stop in windows:
+            start -= start % stride
+            if aligned and start <= aligned[-1][1]:
+                aligned[-1] = (aligned[-1][0], stop)
+            else:
+                aligned.append((start, stop))
+        windows = aligned
+        print(f"Coarse pass found {len(windows)} motion windows covering "
+              f"{sum(stop - start for start, stop in windows)} of {len(coarse_metrics)} frames.")
+
+        # --- Fine pass, only inside the windows ---
+        fine_outputs = self._fill_skipped(self._stream_windows(video_path, windows))
+        for frame_idx, frame_metrics in enumerate(coarse_metrics):
+            render = None
+            if any(start <= frame_idx < stop for start, stop in windows):
+                _, frame_metrics, render = next(fine_outputs)
+                frame_metrics['pass'] = 'fine'
+            else:
+                frame_metrics = dict(frame_metrics, **{'pass': 'coarse'})
+            if frame_idx in bottoms:
+                frame_metrics['rep_bottom'] = True
+            yield frame_idx, frame_metrics, render
+
+    def _stream_windows(self, video_path, windows):
+        # Analyzes the frame ranges of windows, each followed by an end marker at its stop
+        cap = cv2.VideoCapture(video_path)
+        stride = self.get_analysis_stride(cap.get(cv2.CAP_PROP_FPS))
+        try:
+            for start, stop in windows:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                self._start_video()
+                end = stop
+                for batch in self._read_batches(cap, start=start, stop=stop, stride=stride):
+                    end = batch.get('end', stop)
+                    batch.pop('end', None) # One marker per window, added below
+                    for output in self._analyze_batch(self._infer_batch(batch)):
+                        yield output
+                yield self._end_of_video(end)
+        finally:
+            cap.release()
+
+    def get_queue_depths(self):
+        """
+        Returns the current queue depths of the pipelined mode.
+
+        Returns:
+            dict: {stage name: batches waiting in its output queue}, empty when not pipelined.
+        """
+        if self.pipeline is None:
+            return {}
+        return self.pipeline.queue_depths()
+
+    def _start_video(self):
+        # Forgets the frames of the previous video (or range) the motion gate compares against
+        self.last_results = None
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.tracker is not None:
+            self.tracker.reset()
+
+    def _report_motion_gate(self, num_static, num_frames):
+        if self.motion_gate is not None and num_frames > 0:
+            print(f"Motion gate skipped {num_static} of {num_frames} analyzed frames ({num_static / num_frames:.1%}).")
+
+    def _stream_pipelined(self, cap, stride):
+        # decode -> detect -> pose -> analyze, each stage on its own thread
+        # The tracker needs the keypoints of the previous frame to place the boxes, and the motion gate the
+        # subject's box of the last analyzed frame to skip detection, both detect in the pose stage
+        if self.pose_model.one_stage or self.tracker is not None or self.motion_gate is not None:
+            stages = [("pose", self._infer_batch)]
+        else:
+            stages = [("detect", self._detect_batch), ("pose", self._infer_batch)]
+        stages.append(("analyze", self._analyze_batch))
+        self.pipeline = Pipeline(self._read_batches(cap, stride=stride), stages, queue_size=self.queue_size)
+        return iter(self.pipeline)
+
+    def _read_batches(self, cap, start=0, stop=None, stride=1):
+        # Decode up to batch_size analyzed frames, the models run them in one batch
+        # start is the index of the next frame of cap, stop (exclusive) limits the range
+        # Only every stride-th frame of the video is analyzed, the last batch carries the frame count
+        frame_idx = start
+        while cap.isOpened() and (stop is None or frame_idx < stop):
+            indices, frames = [], []
+            eof = False
+            while len(frames) < self.batch_size and (stop is None or frame_idx < stop):
+                if frame_idx % stride:
+                    success, frame = cap.grab(), None # Skipped frames are never decoded to BGR
+                else:
+                    success, frame = cap.read()
+                if not success:
+                    eof = True
+                    break
+                if frame is not None:
+                    indices.append(frame_idx)
+                    frames.append(frame)
                 frame_idx += 1
-                continue # Skip analysis for this frame
-
-            frame_metrics = {'frame': frame_idx}
-
-            if keypoints.shape[0] > 0: # Check if any person was detected
-                # Analyze the first detected person
-                kpts = keypoints[0]
-                scrs = scores[0]
-
-                # --- Metric Calculation (Example: Squat) ---
-                squat_metrics = analyze_squat(kpts, scrs)
-                frame_metrics.update(squat_metrics) # Add squat metrics to frame data
-
-                # --- Visualization ---
-                # Draw skeleton on the frame
-                img_show = draw_skeleton(frame.copy(), # Draw on a copy
-                                         keypoints, # Pass all detected skeletons
-                                         scores,
-                                         openpose_skeleton=False, # Match model setting
-                                         kpt_thr=self.keypoint_confidence_threshold,
-                                         line_width=config.SKELETON_THICKNESS) # Use thickness from config
-
-                # --- Add metric text with background ---
-                exercise_text = f"Exercise: Squat"
-                angle_text = f"Knee Angle: {frame_metrics.get('knee_angle', 'N/A')}"
-                depth_text = f"Depth: {frame_metrics.get('squat_depth_feedback', 'N/A')}"
-                texts_to_draw = [exercise_text, angle_text, depth_text] # Add more metrics here as needed
-
-                # Define text thickness (make it slightly bolder for larger font)
-                text_thickness = 3
-
-                # Calculate position and draw background/text for each line
-                text_y = config.TEXT_POSITION_OFFSET[1]
-                for i, text in enumerate(texts_to_draw):
-                    (text_width, text_height), baseline = cv2.getTextSize(
-                        text, config.FONT, config.FONT_SCALE, text_thickness
-                    )
-                    # Calculate background rectangle coordinates
-                    rect_x1 = config.TEXT_POSITION_OFFSET[0] - config.TEXT_PADDING
-                    # Adjust y1 based on text_height correctly
-                    rect_y1 = text_y - text_height - config.TEXT_PADDING
-                    rect_x2 = config.TEXT_POSITION_OFFSET[0] + text_width + config.TEXT_PADDING
-                    # Adjust y2 based on baseline
-                    rect_y2 = text_y + baseline + config.TEXT_PADDING
-
-                    # Draw black background rectangle
-                    cv2.rectangle(img_show, (rect_x1, rect_y1), (rect_x2, rect_y2),
-                                  config.TEXT_BG_COLOR, cv2.FILLED)
-
-                    # Draw the text on top
-                    cv2.putText(img_show, text, (config.TEXT_POSITION_OFFSET[0], text_y),
-                                config.FONT, config.FONT_SCALE, config.FONT_COLOR,
-                                text_thickness, cv2.LINE_AA) # Use text_thickness
-
-                    # Update Y position for the next line
-                    text_y += text_height + config.TEXT_LINE_SPACING + baseline # Add baseline for better spacing
+            if frames or eof:
+                batch = {'indices': indices, 'frames': frames, 'inference_time': 0.0}
+                if eof:
+                    batch['end'] = frame_idx
+                yield batch
+            if eof:
+                break
 
+    def _gate_batch(self, batch):
+        # Marks the frames the motion gate lets skip the models, in the stage that sets its subject so
+        # sequential and pipelined runs skip the same frames
+        if self.motion_gate is not None:
+            batch['static'] = [self.motion_gate.is_static(frame) for frame in batch['frames']]
+
+    def _active_frames(self, batch):
+        # Frames of batch that go through the models
+        if 'static' not in batch:
+            return batch['frames']
+        return [frame for frame, static in zip(batch['frames'], batch['static']) if not static]
+
+    def _detect_batch(self, batch):
+        # Detection stage of the pipelined mode, the pose stage reuses its boxes
+        start_time = time.time()
+        try:
+            frames = batch['frames']
+            if not frames:
+                batch['bboxes'] = []
+            elif len(frames) == 1:
+                batch['bboxes'] = [self.pose_model.det_model(frames[0])]
             else:
-                # No person detected
-                img_show = frame.copy() # Show original frame
-                frame_metrics['feedback'] = "No person detected"
-                cv2.putText(img_show, "No person detected",
-                           (config.TEXT_POSITION_OFFSET[0], config.TEXT_POSITION_OFFSET[1]),
-                           config.FONT, config.FONT_SCALE, (0, 0, 255), 1, cv2.LINE_AA)
+                batch['bboxes'] = self.pose_model.det_model.predict_batch(frames)
+        except Exception as e:
+            batch['error'] = e
+        batch['inference_time'] += time.time() - start_time
+        return batch
 
-            # Processing time for frame
-            processing_time = time.time() - start_time
-            frame_metrics['processing_time'] = processing_time
+    def _infer_batch(self, batch):
+        # --- Pose Estimation ---
+        start_time = time.time()
+        if 'error' in batch:
+            return batch
+        try:
+            self._gate_batch(batch)
+            frames = self._active_frames(batch)
+            if not frames:
+                results = []
+            elif self.tracker is not None:
+                results = [self.tracker(frame) for frame in frames]
+            elif 'bboxes' in batch:
+                results = self.pose_model.pose_model.predict_batch(frames, batch['bboxes'])
+            elif len(frames) == 1:
+                results = [self.pose_model(frames[0])]
+            else:
+                results = self.pose_model.predict_batch(frames)
+            batch['results'] = self._reuse_static(batch.get('static'), results)
+        except Exception as e:
+            batch['error'] = e
+        batch['inference_time'] += time.time() - start_time
+        return batch
+
+    def _reuse_static(self, static, results):
+        # Puts the keypoints of the last analyzed frame in place of the static frames
+        if static is None:
+            return results
+        results = iter(results)
+        merged = []
+        for is_static in static:
+            if not is_static:
+                self.last_results = next(results)
+                self.motion_gate.set_subject(*self.last_results)
+            merged.append(self.last_results)
+        return merged
+
+    def _analyze_batch(self, batch):
+        # Returns (frame index, metrics, BGR frame, keypoints, scores) per analyzed frame, nothing is drawn
+        indices = batch['indices']
+        frames = batch['frames']
+        outputs = []
+        if 'error' in batch:
+            print(f"Error during pose model inference on frames {indices[0]}-{indices[-1]}: {batch['error']}")
+            # Skip analysis for these frames
+            outputs = [(frame_idx, {'frame': frame_idx, 'feedback': 'Inference Error'}, None, None, None) for frame_idx in indices]
+        elif frames:
+            # Batched inference time is shared evenly by the frames that went through the models
+            static = batch.get('static', [False] * len(frames))
+            inference_time = batch['inference_time'] / max(1, static.count(False))
+            for frame_idx, frame, (keypoints, scores), is_static in zip(indices, frames, batch['results'], static):
+                start_time = time.time()
+                frame_metrics = self._analyze_frame(frame_idx, keypoints, scores)
+
+                # Processing time for frame
+                processing_time = (0.0 if is_static else inference_time) + time.time() - start_time
+                frame_metrics['processing_time'] = processing_time
+                if 'static' in batch:
+                    frame_metrics['motion_skipped'] = is_static
+
+                # print(f"Frame {frame_idx}: {processing_time:.4f}s, Metrics: {frame_metrics}") # Debug print
+
+                outputs.append((frame_idx, frame_metrics, frame, keypoints, scores))
+        if 'end' in batch:
+            outputs.append(self._end_of_video(batch['end']))
+        return outputs
 
-            # print(f"Frame {frame_idx}: {processing_time:.4f}s, Metrics: {frame_metrics}") # Debug print
+    def _end_of_video(self, num_frames):
+        # Marks the end of the video for _fill_skipped, which fills the skipped frames up to it
+        return num_frames, None, None, None, None
 
-            # <<< Convert final frame to RGB and append >>>
-            processed_frames_rgb.append(cv2.cvtColor(img_show, cv2.COLOR_BGR2RGB))
+    def _fill_skipped(self, outputs):
+        # Yields the analyzed frames of outputs with the frames skipped in between filled in
+        previous = None # (frame index, metrics, keypoints, scores) of the last analyzed frame
+        for frame_idx, frame_metrics, frame, keypoints, scores in outputs:
+            current = None if frame_metrics is None else (frame_idx, frame_metrics, keypoints, scores)
+            if previous is not None:
+                for idx in range(previous[0] + 1, frame_idx):
+                    yield idx, self._interpolate_metrics(idx, previous, current), None
+            if current is None: # End of the video
+                previous = None
+                continue
+            render = None
+            if frame is not None:
+                render = functools.partial(self._render_frame, frame, frame_metrics, keypoints, scores)
+            yield frame_idx, frame_metrics, render
+            previous = current
+
+    def _interpolate_metrics(self, frame_idx, previous, following):
+        """
+        Estimates the metrics of a skipped frame from the analyzed frames around it.
+
+        The keypoints and scores of the analyzed person are interpolated linearly and analyzed
+        again, so angles and feedback stay consistent with each other.
+
+        Args:
+            frame_idx (int): Index of the skipped frame.
+            previous (tuple): (frame index, metrics, keypoints, scores) of the analyzed frame before.
+            following (tuple | None): The same for the analyzed frame after, None at the end of the video.
+
+        Returns:
+            dict: Metrics of the skipped frame, marked with 'interpolated'.
+        """
+        frame_metrics = {'frame': frame_idx}
+        prev_idx, prev_metrics, prev_keypoints, prev_scores = previous
+        if (following is not None and prev_keypoints is not None and following[2] is not None
+                and len(prev_keypoints) > 0 and len(following[2]) > 0):
+            next_idx, _, next_keypoints, next_scores = following
+            t = (frame_idx - prev_idx) / (next_idx - prev_idx)
+            kpts = (1 - t) * prev_keypoints[0] + t * next_keypoints[0]
+            scrs = (1 - t) * prev_scores[0] + t * next_scores[0]
+            frame_metrics.update(analyze_squat(kpts, scrs))
+        else:
+            # Nobody to interpolate on one side, hold the last analyzed frame
+            frame_metrics.update({k: v for k, v in prev_metrics.items() if k not in ('frame', 'processing_time', 'motion_skipped')})
+        frame_metrics['processing_time'] = 0.0 # Never went through the models
+        frame_metrics['interpolated'] = True
+        return frame_metrics
+
+    def process_video(self, video_path):
+        """
+        Processes the video file, performs pose estimation, and calculates metrics.
+
+        Keeps every processed frame in memory, prefer `stream_video` for long videos.
+
+        Args:
+            video_path (str): Path to the input video file.
+
+        Returns:
+            tuple: (list of processed frames, list of metrics per frame, fps)
+                   Returns (None, None, 0) if video cannot be opened.
+        """
+        fps = self.get_video_fps(video_path)
+        if fps is None:
+            return None, None, 0 # Return 0 fps on error
+
+        processed_frames_rgb = [] # Store frames in RGB format
+        all_frame_metrics = []
+        for frame_idx, frame_metrics, render in self.stream_video(video_path):
+            if render is not None:
+                processed_frames_rgb.append(render())
             all_frame_metrics.append(frame_metrics)
-            frame_idx += 1
 
-        cap.release()
-        print(f"Video processing complete. Processed {frame_idx} frames. Original FPS: {fps:.2f}")
+        print(f"Original FPS: {fps:.2f}")
         # <<< Return frames in RGB and FPS >>>
         return processed_frames_rgb, all_frame_metrics, fps
+
+    def _analyze_frame(self, frame_idx, keypoints, scores):
+        """
+        Calculates the metrics of one frame.
+
+        Args:
+            frame_idx (int): Index of the frame in the video.
+            keypoints (np.ndarray): Keypoints of all detected people, (N, 17, 2).
+            scores (np.ndarray): Keypoint scores of all detected people, (N, 17).
+
+        Returns:
+            dict: Metrics of the frame.
+        """
+        frame_metrics = {'frame': frame_idx}
+
+        if keypoints.shape[0] > 0: # Check if any person was detected
+            # Analyze the first detected person
+            kpts = keypoints[0]
+            scrs = scores[0]
+
+            # --- Metric Calculation (Example: Squat) ---
+            squat_metrics = analyze_squat(kpts, scrs)
+            frame_metrics.update(squat_metrics) # Add squat metrics to frame data
+        else:
+            # No person detected
+            frame_metrics['feedback'] = "No person detected"
+
+        return frame_metrics
+
+    def _render_frame(self, frame, frame_metrics, keypoints, scores):
+        """
+        Draws the skeletons and metrics of one analyzed frame on a copy of it.
+
+        Only called for frames that are shown or exported, see `stream_video`.
+
+        Args:
+            frame (np.ndarray | callable): Original BGR frame, or a function returning it
+                (frames still in shared memory).
+            frame_metrics (dict): Metrics of the frame, from `_analyze_frame`.
+            keypoints (np.ndarray): Keypoints of all detected people, (N, 17, 2).
+            scores (np.ndarray): Keypoint scores of all detected people, (N, 17).
+
+        Returns:
+            np.ndarray: Annotated RGB frame.
+        """
+        if callable(frame):
+            frame = frame()
+
+        if keypoints.shape[0] > 0: # Check if any person was detected
+            # --- Visualization ---
+            # Draw skeleton on the frame
+            img_show = draw_skeleton(frame.copy(), # Draw on a copy
+                                     keypoints, # Pass all detected skeletons
+                                     scores,
+                                     openpose_skeleton=False, # Match model setting
+                                     kpt_thr=self.keypoint_confidence_threshold,
+                                     line_width=config.SKELETON_THICKNESS) # Use thickness from config
+
+            # --- Add metric text with background ---
+            exercise_text = f"Exercise: Squat"
+            angle_text = f"Knee Angle: {frame_metrics.get('knee_angle', 'N/A')}"
+            depth_text = f"Depth: {frame_metrics.get('squat_depth_feedback', 'N/A')}"
+            texts_to_draw = [exercise_text, angle_text, depth_text] # Add more metrics here as needed
+
+            # Define text thickness (make it slightly bolder for larger font)
+            text_thickness = 3
+
+            # Calculate position and draw background/text for each line
+            text_y = config.TEXT_POSITION_OFFSET[1]
+            for i, text in enumerate(texts_to_draw):
+                (text_width, text_height), baseline = cv2.getTextSize(
+                    text, config.FONT, config.FONT_SCALE, text_thickness
+                )
+                # Calculate background rectangle coordinates
+                rect_x1 = config.TEXT_POSITION_OFFSET[0] - config.TEXT_PADDING
+                # Adjust y1 based on text_height correctly
+                rect_y1 = text_y - text_height - config.TEXT_PADDING
+                rect_x2 = config.TEXT_POSITION_OFFSET[0] + text_width + config.TEXT_PADDING
+                # Adjust y2 based on baseline
+                rect_y2 = text_y + baseline + config.TEXT_PADDING
+
+                # Draw black background rectangle
+                cv2.rectangle(img_show, (rect_x1, rect_y1), (rect_x2, rect_y2),
+                              config.TEXT_BG_COLOR, cv2.FILLED)
+
+                # Draw the text on top
+                cv2.putText(img_show, text, (config.TEXT_POSITION_OFFSET[0], text_y),
+                            config.FONT, config.FONT_SCALE, config.FONT_COLOR,
+                            text_thickness, cv2.LINE_AA) # Use text_thickness
+
+                # Update Y position for the next line
+                text_y += text_height + config.TEXT_LINE_SPACING + baseline # Add baseline for better spacing
+
+        else:
+            # No person detected
+            img_show = frame.copy() # Show original frame
+            cv2.putText(img_show, "No person detected",
+                       (config.TEXT_POSITION_OFFSET[0], config.TEXT_POSITION_OFFSET[1]),
+                       config.FONT, config.FONT_SCALE, (0, 0, 255), 1, cv2.LINE_AA)
+
+        # <<< Convert final frame to RGB >>>
+        return cv2.cvtColor(img_show, cv2.COLOR_BGR2RGB)
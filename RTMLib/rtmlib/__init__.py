@@ -1,8 +1,9 @@
 from .tools import (RTMO, YOLOX, Body, Hand, PoseTracker, RTMDet, RTMPose,
-                    Wholebody, BodyWithFeet, Custom)
+                    Wholebody, BodyWithFeet, Custom, SessionConfig)
 from .visualization.draw import draw_bbox, draw_skeleton
 
 __all__ = [
     'RTMDet', 'RTMPose', 'YOLOX', 'Wholebody', 'Body', 'draw_skeleton',
-    'draw_bbox', 'PoseTracker', 'Hand', 'RTMO', 'BodyWithFeet', 'Custom'
+    'draw_bbox', 'PoseTracker', 'Hand', 'RTMO', 'BodyWithFeet', 'Custom',
+    'SessionConfig'
 ]
@@ -1,8 +1,9 @@
+from .base import SessionConfig
 from .object_detection import YOLOX, RTMDet
 from .pose_estimation import RTMO, RTMPose
 from .solution import Body, Hand, PoseTracker, Wholebody, BodyWithFeet, Custom
 
 __all__ = [
     'RTMDet', 'RTMPose', 'YOLOX', 'Wholebody', 'Body', 'Hand', 'PoseTracker',
-    'RTMO', 'BodyWithFeet', 'Custom'
+    'RTMO', 'BodyWithFeet', 'Custom', 'SessionConfig'
 ]
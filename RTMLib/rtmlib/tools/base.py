@@ -1,11 +1,12 @@
 import os
+import threading
 from abc import ABCMeta, abstractmethod
-from typing import Any
+from typing import Any, Callable
 
 import cv2
 import numpy as np
 
-from .file import download_checkpoint
+from .file import download_checkpoint, get_ort_cache_path, prune_ort_cache
 def check_mps_support():
     try:
         import onnxruntime
@@ -29,6 +30,133 @@ RTMLIB_SETTINGS = {
     },
 }
 
+ORT_TYPES = {
+    'tensor(float)': np.float32,
+    'tensor(float16)': np.float16,
+    'tensor(double)': np.float64,
+    'tensor(int64)': np.int64,
+    'tensor(int32)': np.int32,
+    'tensor(uint8)': np.uint8,
+    'tensor(bool)': np.bool_,
+}
+
+
+class SessionConfig:
+    """Runtime options shared by the inference sessions of a solution.
+
+    A single config is passed from the solutions (e.g. `Body`,
+    `PoseTracker`, `Custom`) down to every model they build, so that several
+    workers on one machine can split the cores between them instead of each
+    session grabbing all of them.
+
+    Args:
+        intra_op_num_threads (int): Threads used to parallelize a single
+            operator. 0 lets the backend decide. Defaults to 0.
+        inter_op_num_threads (int): Threads used to run independent
+            operators concurrently in 'parallel' execution mode. 0 lets the
+            backend decide. Defaults to 0.
+        execution_mode (str): 'sequential' or 'parallel'. Defaults to
+            'sequential'.
+        graph_optimization_level (str): 'disable', 'basic', 'extended' or
+            'all'. Defaults to 'all'.
+        enable_mem_arena (bool): Whether to use the CPU memory arena.
+            Defaults to True.
+        allow_spinning (bool): Whether idle worker threads busy-wait for new
+            work. Turn it off when several sessions share the same cores.
+            Defaults to True.
+        io_binding (bool): Run ONNX Runtime through IOBinding with persistent
+            input/output buffers instead of allocating them on every call.
+            Outputs returned by `inference` are then overwritten by the next
+            call. Defaults to False.
+        performance_hint (str): OpenVINO performance hint, 'latency' or
+            'throughput'. Throughput mode runs several infer requests in
+            parallel, fed through `BaseTool.submit_inference`. Defaults to
+            'latency'.
+        num_infer_requests (int): Number of OpenVINO infer requests kept in
+            flight by `submit_inference`. 0 uses the optimal number reported
+            by the compiled model. Defaults to 0.
+        cache_optimized_model (bool): Save the graph ONNX Runtime optimized
+            on the first start and load it on later starts, skipping the
+            optimization passes. Defaults to True.
+        model_cache_dir (str, optional): Directory of the optimized models.
+            Defaults to `ort_cache` in the rtmlib hub directory.
+    """
+    EXECUTION_MODES = ('sequential', 'parallel')
+    OPTIMIZATION_LEVELS = ('disable', 'basic', 'extended', 'all')
+    PERFORMANCE_HINTS = ('latency', 'throughput')
+
+    def __init__(self,
+                 intra_op_num_threads: int = 0,
+                 inter_op_num_threads: int = 0,
+                 execution_mode: str = 'sequential',
+                 graph_optimization_level: str = 'all',
+                 enable_mem_arena: bool = True,
+                 allow_spinning: bool = True,
+                 io_binding: bool = False,
+                 performance_hint: str = 'latency',
+                 num_infer_requests: int = 0,
+                 cache_optimized_model: bool = True,
+                 model_cache_dir: str = None):
+        assert execution_mode in self.EXECUTION_MODES, (
+            f'execution_mode should be one of {self.EXECUTION_MODES}')
+        assert performance_hint in self.PERFORMANCE_HINTS, (
+            f'performance_hint should be one of {self.PERFORMANCE_HINTS}')
+        assert graph_optimization_level in self.OPTIMIZATION_LEVELS, (
+            'graph_optimization_level should be one of '
+            f'{self.OPTIMIZATION_LEVELS}')
+
+        self.intra_op_num_threads = intra_op_num_threads
+        self.inter_op_num_threads = inter_op_num_threads
+        self.execution_mode = execution_mode
+        self.graph_optimization_level = graph_optimization_level
+        self.enable_mem_arena = enable_mem_arena
+        self.allow_spinning = allow_spinning
+        self.io_binding = io_binding
+        self.performance_hint = performance_hint
+        self.num_infer_requests = num_infer_requests
+        self.cache_optimized_model = cache_optimized_model
+        self.model_cache_dir = model_cache_dir
+
+    def __repr__(self):
+        options = ', '.join(f'{k}={v!r}' for k, v in vars(self).items())
+        return f'{self.__class__.__name__}({options})'
+
+    def to_onnxruntime(self):
+        """Build the `onnxruntime.SessionOptions` for this config."""
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_num_threads
+        options.inter_op_num_threads = self.inter_op_num_threads
+        options.execution_mode = {
+            'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+            'parallel': ort.ExecutionMode.ORT_PARALLEL,
+        }[self.execution_mode]
+        options.graph_optimization_level = {
+            'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.graph_optimization_level]
+        options.enable_cpu_mem_arena = self.enable_mem_arena
+
+        spinning = '1' if self.allow_spinning else '0'
+        options.add_session_config_entry('session.intra_op.allow_spinning',
+                                         spinning)
+        options.add_session_config_entry('session.inter_op.allow_spinning',
+                                         spinning)
+        return options
+
+    def to_openvino(self) -> dict:
+        """Build the OpenVINO compile config entries for this config."""
+        config = {'PERFORMANCE_HINT': self.performance_hint.upper()}
+        if self.num_infer_requests > 0:
+            config['PERFORMANCE_HINT_NUM_REQUESTS'] = self.num_infer_requests
+        if self.intra_op_num_threads > 0:
+            config['INFERENCE_NUM_THREADS'] = self.intra_op_num_threads
+        return config
+
+
 class BaseTool(metaclass=ABCMeta):
 
     def __init__(self,
@@ -37,11 +165,30 @@ class BaseTool(metaclass=ABCMeta):
                  mean: tuple = None,
                  std: tuple = None,
                  backend: str = 'opencv',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
+
+        if session_config is None:
+            session_config = SessionConfig()
 
         if not os.path.exists(onnx_model):
             onnx_model = download_checkpoint(onnx_model)
 
+        if quantized:
+            # reuses an existing (e.g. statically calibrated) int8 model
+            from .quantization import quantize_model
+            onnx_model = quantize_model(onnx_model)
+
+        if uint8_input and backend == 'opencv':
+            print('OpenCV backend does not support models with embedded'
+                  ' preprocessing, automatically switched uint8_input off.')
+            uint8_input = False
+        if uint8_input:
+            from .onnx_preprocess import embed_preprocessing
+            onnx_model = embed_preprocessing(onnx_model, mean, std)
+
         if backend == 'opencv':
             try:
                 providers = RTMLIB_SETTINGS[backend][device]
@@ -59,14 +206,21 @@ class BaseTool(metaclass=ABCMeta):
                     ' backend. Then specify `backend=onnxruntime`.')  # noqa
 
         elif backend == 'onnxruntime':
-            import onnxruntime as ort
             providers = RTMLIB_SETTINGS[backend][device]
+            self.session = self._create_ort_session(onnx_model, providers,
+                                                    session_config)
 
-            self.session = ort.InferenceSession(path_or_bytes=onnx_model,
-                                                providers=[providers])
+            # resolve the io names once instead of on every frame
+            self.input_name = self.session.get_inputs()[0].name
+            self.output_names = [
+                out.name for out in self.session.get_outputs()
+            ]
 
         elif backend == 'openvino':
-            from openvino.runtime import Core
+            try:
+                from openvino import Core
+            except ImportError:  # openvino < 2023.1
+                from openvino.runtime import Core
             core = Core()
             model_onnx = core.read_model(model=onnx_model)
 
@@ -77,58 +231,402 @@ class BaseTool(metaclass=ABCMeta):
             self.compiled_model = core.compile_model(
                 model=model_onnx,
                 device_name='CPU',
-                config={'PERFORMANCE_HINT': 'LATENCY'})
+                config=session_config.to_openvino())
             self.input_layer = self.compiled_model.input(0)
-            self.output_layer0 = self.compiled_model.output(0)
-            self.output_layer1 = self.compiled_model.output(1)
+            self.output_layers = list(self.compiled_model.outputs)
 
         else:
             raise NotImplementedError
 
         print(f'load {onnx_model} with {backend} backend')
 
+        self.batch_size = self._get_batch_size(backend)
+
         self.onnx_model = onnx_model
         self.model_input_size = model_input_size
         self.mean = mean
         self.std = std
         self.backend = backend
         self.device = device
+        self.session_config = session_config
+
+        self.quantized = quantized
+
+        # models with embedded preprocessing take raw uint8 (N, H, W, 3)
+        self.uint8_input = uint8_input
+        self.input_dtype = np.uint8 if uint8_input else np.float32
+
+        # persistent buffers are only supported by onnxruntime
+        self.io_binding = (session_config.io_binding
+                           and backend == 'onnxruntime')
+        self._bindings = {}
+
+        # created on the first `submit_inference`
+        self._infer_queue = None
+        # the preprocessing, bound input and output buffers are reused by
+        # every call, the lock keeps the calls of different threads apart
+        # (e.g. two videos sharing the model)
+        self._lock = threading.RLock()
+
+    def _create_ort_session(self, onnx_model: str, provider: str,
+                            session_config: SessionConfig):
+        """Create the ONNX Runtime session, through the optimized model
+        cache when `session_config.cache_optimized_model` is set."""
+        import onnxruntime as ort
+
+        sess_options = session_config.to_onnxruntime()
+        if not session_config.cache_optimized_model or \
+                session_config.graph_optimization_level == 'disable':
+            return ort.InferenceSession(onnx_model,
+                                        sess_options=sess_options,
+                                        providers=[provider])
+
+        cached = get_ort_cache_path(onnx_model, provider,
+                                    session_config.graph_optimization_level,
+                                    session_config.model_cache_dir)
+        if os.path.exists(cached):
+            # already optimized, skip the graph transformations
+            sess_options.graph_optimization_level = \
+                ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                return ort.InferenceSession(cached,
+                                            sess_options=sess_options,
+                                            providers=[provider])
+            except Exception:
+                print(f'ignore broken optimized model {cached}')
+                os.remove(cached)
+                sess_options = session_config.to_onnxruntime()
+
+        # written under a temporary name, so concurrent starts never load a
+        # half written model
+        tmp = f'{cached}.{os.getpid()}.tmp'
+        sess_options.optimized_model_filepath = tmp
+        try:
+            session = ort.InferenceSession(onnx_model,
+                                           sess_options=sess_options,
+                                           providers=[provider])
+            if os.path.exists(tmp):
+                os.replace(tmp, cached)
+                # entries of an older model file or onnxruntime version
+                # would otherwise pile up
+                prune_ort_cache(cached)
+        except Exception:
+            # e.g. providers that compile nodes cannot serialize them
+            return ort.InferenceSession(
+                onnx_model,
+                sess_options=session_config.to_onnxruntime(),
+                providers=[provider])
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return session
 
     @abstractmethod
     def __call__(self, *args, **kwargs) -> Any:
         """Implement the actual function here."""
         raise NotImplementedError
 
-    def inference(self, img: np.ndarray):
+    def _get_batch_size(self, backend: str):
+        """Get the batch size the model was exported with.
+
+        Returns:
+            int | None: Fixed batch size of the model input, or None if the
+                batch dimension is dynamic.
+        """
+        if backend == 'onnxruntime':
+            batch_dim = self.session.get_inputs()[0].shape[0]
+            return batch_dim if isinstance(batch_dim, int) else None
+        elif backend == 'openvino':
+            batch_dim = self.input_layer.get_partial_shape()[0]
+            return batch_dim.get_length() if batch_dim.is_static else None
+
+        # opencv dnn always runs a single image
+        return 1
+
+    def has_dynamic_input_size(self) -> bool:
+        """Whether the model runs on other input sizes than it was loaded
+        with.
+
+        Returns:
+            bool: True if the height and width of the model input are
+                dynamic.
+        """
+        if self.backend == 'onnxruntime':
+            shape = self.session.get_inputs()[0].shape
+        elif self.backend == 'openvino':
+            shape = [
+                dim.get_length() if dim.is_static else None
+                for dim in self.input_layer.get_partial_shape()
+            ]
+        else:
+            return False
+        spatial = shape[1:3] if self.uint8_input else shape[2:4]
+        return not all(isinstance(dim, int) for dim in spatial)
+
+    def get_input_shape(self, num: int, height: int, width: int) -> tuple:
+        """Get the model input shape for `num` images of a given size.
+
+        Returns:
+            tuple: (N, 3, H, W), or (N, H, W, 3) for models with embedded
+                preprocessing.
+        """
+        if self.uint8_input:
+            return (num, height, width, 3)
+        return (num, 3, height, width)
+
+    def get_input_buffer(self, input_shape: tuple):
+        """Get the persistent model input buffer for an input shape.
+
+        Preprocessing can write straight into this buffer, `inference` then
+        skips copying it.
+
+        Args:
+            input_shape (tuple): Model input shape, see `get_input_shape`.
+
+        Returns:
+            np.ndarray | None: Bound input buffer of `input_dtype`, or None
+                if the tool does not run with
+                `SessionConfig(io_binding=True)`.
+        """
+        if not self.io_binding:
+            return None
+        return self._get_binding(tuple(input_shape))[0]
+
+    def inference(self, img: np.ndarray, channel_first: bool = False):
         """Inference model.
 
+        Models exported with a fixed batch size are fed in chunks of that
+        size, so callers can always pass the whole batch at once.
+
         Args:
-            img (np.ndarray): Input image in shape.
+            img (np.ndarray): Input image in shape (H, W, C), or a batch of
+                images in shape (N, H, W, C).
+            channel_first (bool): Whether `img` is already laid out as
+                (C, H, W) or (N, C, H, W). Ignored with `uint8_input`, where
+                the model takes (N, H, W, C) images as they are.
 
         Returns:
-            outputs (np.ndarray): Output of RTMPose model.
+            outputs (List[np.ndarray]): Outputs of the model, batched along
+                the first axis. With `SessionConfig(io_binding=True)` these
+                are reused buffers that are overwritten by the next call.
+        """
+        if img.ndim == 3:
+            img = img[None]
+
+        # (N, H, W, 3) -> (N, 3, H, W), copied when building the input
+        if not channel_first and not self.uint8_input:
+            img = img.transpose(0, 3, 1, 2)
+
+        batch_size = self.batch_size
+        if batch_size is None or len(img) == batch_size:
+            return self._run(self._build_input(img, len(img)))
+
+        # fixed batch model, run in chunks and pad the last one
+        chunk_outputs = []
+        for start in range(0, len(img), batch_size):
+            chunk = img[start:start + batch_size]
+            outputs = self._run(self._build_input(chunk, batch_size))
+            # bound output buffers are overwritten by the next chunk
+            chunk_outputs.append([out[:len(chunk)].copy() for out in outputs])
+
+        return [np.concatenate(outs, axis=0) for outs in zip(*chunk_outputs)]
+
+    def submit_inference(self,
+                         img: np.ndarray,
+                         callback: Callable,
+                         userdata: Any = None,
+                         channel_first: bool = False):
+        """Start inference without waiting for the result.
+
+        With the OpenVINO backend the input is queued on an
+        `AsyncInferQueue`, so several frames or crops are in flight at once
+        (see `SessionConfig(performance_hint='throughput')`). Other backends
+        run it right away in the calling thread.
+
+        Args:
+            img (np.ndarray): Input as for `inference`.
+            callback (Callable): Called as `callback(outputs, userdata)`
+                once the outputs are ready, from an OpenVINO worker thread.
+                `outputs` are copies owned by the callback.
+            userdata (Any): Passed through to `callback`.
+            channel_first (bool): See `inference`.
         """
-        # build input to (1, 3, H, W)
-        img = img.transpose(2, 0, 1)
-        img = np.ascontiguousarray(img, dtype=np.float32)
-        input = img[None, :, :, :]
+        if self.backend != 'openvino':
+            outputs = self.inference(img, channel_first=channel_first)
+            if self.io_binding:
+                outputs = [out.copy() for out in outputs]
+            callback(outputs, userdata)
+            return
 
-        # run model
+        if self._infer_queue is None:
+            try:
+                from openvino import AsyncInferQueue
+            except ImportError:  # openvino < 2023.1
+                from openvino.runtime import AsyncInferQueue
+
+            # 0 jobs lets OpenVINO pick the optimal number of requests
+            self._infer_queue = AsyncInferQueue(
+                self.compiled_model, self.session_config.num_infer_requests)
+            self._infer_queue.set_callback(self._on_infer_done)
+
+        if img.ndim == 3:
+            img = img[None]
+        if not channel_first and not self.uint8_input:
+            img = img.transpose(0, 3, 1, 2)
+
+        # fixed batch models get one request per chunk, gathered again
+        batch_size = self.batch_size or len(img)
+        starts = range(0, len(img), batch_size)
+        gather = _GatherOutputs(len(starts), callback, userdata)
+        for i, start in enumerate(starts):
+            chunk = img[start:start + batch_size]
+            self._infer_queue.start_async(
+                {0: self._build_input(chunk, batch_size)},
+                (gather, i, len(chunk)))
+
+    def wait_all(self):
+        """Wait until every submitted inference has called back."""
+        if self._infer_queue is not None:
+            self._infer_queue.wait_all()
+
+    def _on_infer_done(self, request, userdata):
+        """Copy the outputs of a finished OpenVINO request."""
+        gather, index, num = userdata
+        outputs = [
+            request.get_tensor(layer).data[:num].copy()
+            for layer in self.output_layers
+        ]
+        gather.add(index, outputs)
+
+    def _build_input(self, img: np.ndarray, batch_size: int) -> np.ndarray:
+        """Build the contiguous model input of `input_dtype`.
+
+        Args:
+            img (np.ndarray): Images in the model input layout, any dtype.
+            batch_size (int): Batch size of the model input. Missing
+                instances are zero padded.
+
+        Returns:
+            np.ndarray: Model input with `batch_size` instances.
+        """
+        num = len(img)
+        if self.io_binding:
+            # cast and copy straight into the bound input buffer
+            input = self._get_binding((batch_size, *img.shape[1:]))[0]
+            if img.ctypes.data != input.ctypes.data:
+                np.copyto(input[:num], img, casting='unsafe')
+                input[num:] = 0
+            return input
+
+        input = np.ascontiguousarray(img, dtype=self.input_dtype)
+        if num < batch_size:
+            pad = np.zeros((batch_size - num, *input.shape[1:]),
+                           dtype=input.dtype)
+            input = np.concatenate([input, pad], axis=0)
+        return input
+
+    def _get_binding(self, input_shape: tuple):
+        """Get the IOBinding and persistent buffers for an input shape.
+
+        Outputs whose shape is known once the batch size is fixed are bound
+        to preallocated arrays, the rest are left for ONNX Runtime to
+        allocate on every run.
+
+        Args:
+            input_shape (tuple): Model input shape.
+
+        Returns:
+            tuple:
+            - input (np.ndarray): Bound input buffer.
+            - io_binding (onnxruntime.IOBinding): Binding of the session.
+            - outputs (List[np.ndarray | None]): Bound output buffers, None
+                for outputs with a dynamic shape.
+        """
+        binding = self._bindings.get(input_shape)
+        if binding is not None:
+            return binding
+
+        input = np.zeros(input_shape, dtype=self.input_dtype)
+        io_binding = self.session.io_binding()
+        io_binding.bind_input(self.input_name, 'cpu', 0, input.dtype,
+                              list(input_shape), input.ctypes.data)
+
+        outputs = []
+        for out in self.session.get_outputs():
+            shape = list(out.shape)
+            if shape and not isinstance(shape[0], int):
+                shape[0] = input_shape[0]
+
+            if all(isinstance(dim, int) for dim in shape):
+                buffer = np.empty(shape, dtype=ORT_TYPES[out.type])
+                io_binding.bind_output(out.name, 'cpu', 0, buffer.dtype,
+                                       shape, buffer.ctypes.data)
+            else:
+                buffer = None
+                io_binding.bind_output(out.name, 'cpu')
+            outputs.append(buffer)
+
+        binding = (input, io_binding, outputs)
+        self._bindings[input_shape] = binding
+        return binding
+
+    def _run(self, input: np.ndarray):
+        """Run the backend on a model-ready input.
+
+        Args:
+            input (np.ndarray): Input tensor in shape (N, 3, H, W), or
+                (N, H, W, 3) uint8 with `uint8_input`.
+
+        Returns:
+            outputs (List[np.ndarray]): Outputs of the model.
+        """
         if self.backend == 'opencv':
             outNames = self.session.getUnconnectedOutLayersNames()
             self.session.setInput(input)
             outputs = self.session.forward(outNames)
         elif self.backend == 'onnxruntime':
-            sess_input = {self.session.get_inputs()[0].name: input}
-            sess_output = []
-            for out in self.session.get_outputs():
-                sess_output.append(out.name)
+            if self.io_binding:
+                _, io_binding, buffers = self._get_binding(input.shape)
+                self.session.run_with_iobinding(io_binding)
 
-            outputs = self.session.run(sess_output, sess_input)
+                outputs = list(buffers)
+                if any(buffer is None for buffer in buffers):
+                    ort_outputs = io_binding.get_outputs()
+                    for i, buffer in enumerate(buffers):
+                        if buffer is None:
+                            outputs[i] = ort_outputs[i].numpy()
+            else:
+                outputs = self.session.run(self.output_names,
+                                           {self.input_name: input})
         elif self.backend == 'openvino':
             results = self.compiled_model(input)
-            output0 = results[self.output_layer0]
-            output1 = results[self.output_layer1]
-            outputs = [output0, output1]
+            outputs = [results[layer] for layer in self.output_layers]
 
         return outputs
+
+
+class _GatherOutputs:
+    """Concatenate the outputs of the chunks of one submitted input."""
+
+    def __init__(self, num_chunks: int, callback: Callable, userdata: Any):
+        self.chunks = [None] * num_chunks
+        self.pending = num_chunks
+        self.callback = callback
+        self.userdata = userdata
+        self.lock = threading.Lock()
+
+    def add(self, index: int, outputs: list):
+        with self.lock:
+            self.chunks[index] = outputs
+            self.pending -= 1
+            done = self.pending == 0
+        if not done:
+            return
+
+        if len(self.chunks) == 1:
+            outputs = self.chunks[0]
+        else:
+            outputs = [
+                np.concatenate(outs, axis=0) for outs in zip(*self.chunks)
+            ]
+        self.callback(outputs, self.userdata)
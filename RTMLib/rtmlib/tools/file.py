@@ -1,11 +1,14 @@
 import hashlib
 import os
+import platform
 import re
 import sys
 import tempfile
+import time
+from glob import escape as glob_escape
 from glob import glob
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from urllib.parse import urlparse  # noqa: F401
 from urllib.request import Request, urlopen
 import zipfile
@@ -21,6 +24,105 @@ def _get_rtmhub_dir():
             os.path.join(os.getenv('XDG_CACHE_HOME', '~/.cache'), 'rtmlib')))
     return os.path.join(torch_home, 'hub')
 
+# optimized model cache entries: <stem>-<model key>-ort<version>-<settings>
+_ORT_CACHE_ENTRY = re.compile(
+    r'^(?P<stem>.+)-[0-9a-f]{16}-ort[^-]+-(?P<settings>[^-]+-[^-]+-[^-]+)'
+    r'\.onnx$')
+# partially written entries older than this are left over by a crash
+_ORT_CACHE_TMP_AGE = 3600
+
+
+def _model_key(path: str) -> str:
+    """Identify a model file by its path, size and modification time.
+
+    Unlike hashing the content this costs nothing on large models, a
+    replaced or re-downloaded model gets a new key.
+    """
+    stat = os.stat(path)
+    ident = f'{os.path.realpath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}'
+    return hashlib.sha256(ident.encode()).hexdigest()[:16]
+
+
+def get_ort_cache_path(onnx_model: str,
+                       provider: str,
+                       optimization_level: str,
+                       cache_dir: Optional[str] = None) -> str:
+    """Get the cache path of an ONNX Runtime optimized model.
+
+    The file name is keyed by the model file (path, size and modification
+    time), the ONNX Runtime version, the execution provider, the graph
+    optimization level and the machine, since 'all' level optimizations can
+    be hardware specific.
+
+    Args:
+        onnx_model (str): Path of the original model.
+        provider (str): ONNX Runtime execution provider.
+        optimization_level (str): Graph optimization level of the session.
+        cache_dir (str, optional): Cache directory. Defaults to
+            `ort_cache` in the rtmlib hub directory.
+
+    Returns:
+        str: Path of the optimized model, which may not exist yet.
+    """
+    import onnxruntime as ort
+
+    if cache_dir is None:
+        cache_dir = os.path.join(_get_rtmhub_dir(), 'ort_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+
+    stem = os.path.splitext(os.path.basename(onnx_model))[0]
+    key = '-'.join([
+        _model_key(onnx_model), f'ort{ort.__version__}',
+        provider.replace('ExecutionProvider', '').lower(), optimization_level,
+        platform.machine().lower()
+    ])
+    return os.path.join(cache_dir, f'{stem}-{key}.onnx')
+
+
+def prune_ort_cache(cached: str) -> List[str]:
+    """Remove the stale entries of an optimized model cache entry.
+
+    Stale are the entries of the same model and settings keyed by an older
+    model file or ONNX Runtime version, and partially written entries of the
+    model left over by a crash.
+
+    Args:
+        cached (str): Path of the current entry, from `get_ort_cache_path`.
+
+    Returns:
+        List[str]: Paths of the removed files.
+    """
+    cache_dir, name = os.path.split(cached)
+    entry = _ORT_CACHE_ENTRY.match(name)
+    if entry is None:
+        return []
+
+    removed = []
+    prefix = os.path.join(glob_escape(cache_dir),
+                          glob_escape(entry.group('stem')))
+    for path in glob(prefix + '-*.onnx'):
+        other = _ORT_CACHE_ENTRY.match(os.path.basename(path))
+        if path == cached or other is None or \
+                other.group('stem') != entry.group('stem') or \
+                other.group('settings') != entry.group('settings'):
+            continue
+        removed.append(path)
+    now = time.time()
+    for path in glob(prefix + '-*.onnx.*.tmp'):
+        try:
+            if now - os.path.getmtime(path) > _ORT_CACHE_TMP_AGE:
+                removed.append(path)
+        except OSError:
+            pass
+
+    for path in removed:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # e.g. removed by a concurrent start
+    return removed
+
+
 def extract_zip(zip_file_path, extract_to_path):
     if not os.path.exists(extract_to_path):
         os.makedirs(extract_to_path)
@@ -0,0 +1,271 @@
+import copy
+from abc import abstractmethod
+from typing import Any, Callable, List
+
+import numpy as np
+
+from ..base import BaseTool, SessionConfig
+from .post_processings import decode_yolox_boxes, multiclass_nms
+from .pre_processings import LetterBox
+
+
+class LetterBoxModel(BaseTool):
+    """Base of the models run on one letterboxed image: YOLOX, RTMDet and
+    RTMO.
+
+    Implements the preprocessing on the shared `LetterBox` engine and the
+    single, batched and asynchronous inference around it. Subclasses only
+    decode the outputs of one image in `decode`.
+
+    Args:
+        onnx_model (str): Path of the ONNX model.
+        model_input_size (tuple): Model input size (h, w).
+        mean (tuple, optional): Per-channel mean, None to skip
+            normalization.
+        std (tuple, optional): Per-channel std, None to skip normalization.
+        backend (str): Inference backend.
+        device (str): Inference device.
+        session_config (SessionConfig, optional): Session options.
+        uint8_input (bool): Run the model with the preprocessing embedded.
+        quantized (bool): Run the INT8 quantized model.
+    """
+
+    def __init__(self,
+                 onnx_model: str,
+                 model_input_size: tuple = (640, 640),
+                 mean: tuple = None,
+                 std: tuple = None,
+                 backend: str = 'onnxruntime',
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
+        super().__init__(onnx_model,
+                         model_input_size,
+                         mean,
+                         std,
+                         backend=backend,
+                         device=device,
+                         session_config=session_config,
+                         uint8_input=uint8_input,
+                         quantized=quantized)
+        self.letterbox = LetterBox(model_input_size,
+                                   mean,
+                                   std,
+                                   uint8_hwc=uint8_input)
+
+    @abstractmethod
+    def decode(self, outputs: List[np.ndarray], ratio: float, **kwargs):
+        """Decode the model outputs of one image.
+
+        Args:
+            outputs (List[np.ndarray]): Model outputs, with a batch
+                dimension of 1.
+            ratio (float): Resize ratio of the image.
+            **kwargs: Options passed to `__call__`, `submit` or
+                `predict_batch`.
+        """
+        raise NotImplementedError
+
+    def __call__(self, image: np.ndarray, **kwargs):
+        with self._lock:
+            image, ratio = self.preprocess(image)
+            outputs = self.inference(image, channel_first=True)
+            return self.decode(outputs, ratio, **kwargs)
+
+    def submit(self,
+               image: np.ndarray,
+               callback: Callable,
+               userdata: Any = None,
+               **kwargs):
+        """Run the model asynchronously, see `BaseTool.submit_inference`.
+
+        Args:
+            image (np.ndarray): Input image.
+            callback (Callable): Called as `callback(result, userdata)`, with
+                the result `__call__` returns.
+            userdata (Any): Passed through to `callback`.
+            **kwargs: Options of `__call__`.
+        """
+
+        def done(outputs, userdata):
+            callback(self.decode(outputs, ratio, **kwargs), userdata)
+
+        with self._lock:
+            image, ratio = self.preprocess(image)
+            self.submit_inference(image, done, userdata, channel_first=True)
+
+    def predict_batch(self, images: List[np.ndarray], **kwargs) -> list:
+        """Run the model on several images with one model run.
+
+        Models with a dynamic batch dimension run all images at once, fixed
+        batch models in chunks of their batch size.
+
+        Args:
+            images (List[np.ndarray]): Input images, e.g. consecutive video
+                frames.
+            **kwargs: Options of `__call__`.
+
+        Returns:
+            list: The result `__call__` returns for each image.
+        """
+        if len(images) == 0:
+            return []
+        with self._lock:
+            imgs, ratios = self.preprocess_batch(images)
+            outputs = self.inference(imgs, channel_first=True)
+            return [
+                self.decode([out[i:i + 1] for out in outputs], ratio,
+                            **kwargs) for i, ratio in enumerate(ratios)
+            ]
+
+    def with_input_size(self, model_input_size: tuple) -> 'LetterBoxModel':
+        """Get a model running this one at another input size.
+
+        The session is shared, nothing is loaded again. Needs a model
+        exported with a dynamic input height and width, see
+        `has_dynamic_input_size`. Smaller sizes run faster, e.g. on a
+        crop around a tracked person.
+
+        Args:
+            model_input_size (tuple): Model input size (h, w), multiples
+                of 32.
+
+        Returns:
+            LetterBoxModel: Model of the same class sharing the session of
+                this one.
+        """
+        model = copy.copy(self)
+        model.model_input_size = tuple(model_input_size)
+        model.letterbox = LetterBox(model_input_size,
+                                    self.mean,
+                                    self.std,
+                                    uint8_hwc=self.uint8_input)
+        return model
+
+    def preprocess(self, img: np.ndarray):
+        """Letterbox an image into the model input.
+
+        Args:
+            img (np.ndarray): Input image in shape (H, W, 3).
+
+        Returns:
+            tuple:
+            - padded_img (np.ndarray): Letterboxed image in shape (3, H, W),
+                float32, or (H, W, 3) uint8 with `uint8_input`.
+            - ratio (float): Resize ratio of the image.
+        """
+        out = self.get_input_buffer(
+            self.get_input_shape(1, *self.model_input_size))
+        if out is not None:
+            out = out[0]
+        return self.letterbox(img, out=out)
+
+    def preprocess_batch(self, imgs: List[np.ndarray]):
+        """Letterbox several images into one model input.
+
+        Args:
+            imgs (List[np.ndarray]): Input images.
+
+        Returns:
+            tuple:
+            - padded_imgs (np.ndarray): Letterboxed images in shape
+                (N, 3, H, W), float32, or (N, H, W, 3) uint8 with
+                `uint8_input`.
+            - ratios (np.ndarray): Resize ratio of each image.
+        """
+        out = None
+        if self.batch_size is None or len(imgs) == self.batch_size:
+            out = self.get_input_buffer(
+                self.get_input_shape(len(imgs), *self.model_input_size))
+        return self.letterbox.batch(imgs, out=out)
+
+
+class Detector(LetterBoxModel):
+    """Person detector with a YOLOX-style head, the base of YOLOX and
+    RTMDet.
+
+    Args:
+        nms_thr (float): IoU threshold of NMS.
+        score_thr (float): Minimum score of a detection.
+        person_only (bool): Only score the person class.
+        Other args: See `LetterBoxModel`.
+    """
+
+    def __init__(self,
+                 onnx_model: str,
+                 model_input_size: tuple = (640, 640),
+                 mean: tuple = None,
+                 std: tuple = None,
+                 nms_thr: float = 0.45,
+                 score_thr: float = 0.7,
+                 backend: str = 'onnxruntime',
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 person_only: bool = True,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
+        super().__init__(onnx_model,
+                         model_input_size,
+                         mean,
+                         std,
+                         backend=backend,
+                         device=device,
+                         session_config=session_config,
+                         uint8_input=uint8_input,
+                         quantized=quantized)
+        self.nms_thr = nms_thr
+        self.score_thr = score_thr
+        self.person_only = person_only
+
+    def decode(self, outputs: List[np.ndarray], ratio: float):
+        """Decode the outputs of one image, see `postprocess`."""
+        return self.postprocess(outputs[0], ratio)
+
+    def postprocess(
+        self,
+        outputs: np.ndarray,
+        ratio: float = 1.,
+    ) -> np.ndarray:
+        """Do postprocessing for detector inference.
+
+        Args:
+            outputs (np.ndarray): First output of the model.
+            ratio (float): Ratio of preprocessing.
+
+        Returns:
+            np.ndarray: xyxy-format bounding boxes of the persons.
+        """
+
+        if outputs.shape[-1] == 5:
+            # onnx contains nms module
+
+            pack_dets = (outputs[0, :, :4], outputs[0, :, 4])
+            final_boxes, final_scores = pack_dets
+            final_boxes /= ratio
+            final_boxes = final_boxes[final_scores > 0.3]
+
+        else:
+            # onnx without nms module, raw (box, obj, cls...) predictions
+
+            predictions = outputs[0]
+            boxes_xyxy = decode_yolox_boxes(predictions,
+                                            self.model_input_size, ratio)
+            # only persons are returned, so skip the other class columns
+            cls_scores = predictions[:, 5:6] if self.person_only \
+                else predictions[:, 5:]
+            scores = predictions[:, 4:5] * cls_scores
+
+            dets, keep = multiclass_nms(boxes_xyxy,
+                                        scores,
+                                        nms_thr=self.nms_thr,
+                                        score_thr=self.score_thr)
+            if dets is None:
+                return np.zeros((0, 4), dtype=boxes_xyxy.dtype)
+
+            pack_dets = (dets[:, :4], dets[:, 4], dets[:, 5])
+            final_boxes, final_scores, final_cls_inds = pack_dets
+            isbbox = (final_scores > 0.3) & (final_cls_inds == 0)
+            final_boxes = final_boxes[isbbox]
+
+        return final_boxes
@@ -1,57 +1,169 @@
+from functools import lru_cache
+from typing import Tuple
+
 import numpy as np
 
 
-def nms(boxes, scores, nms_thr):
-    """Single class NMS implemented in Numpy."""
+def nms(boxes, scores, nms_thr, top_k=None):
+    """Single class NMS implemented in Numpy.
+
+    Greedy NMS: the candidates are sorted by score, optionally cut to the
+    `top_k` best, and every kept box suppresses the remaining candidates it
+    overlaps in one vectorized pass.
+
+    Args:
+        boxes (np.ndarray): Boxes in shape (N, 4), xyxy format.
+        scores (np.ndarray): Scores in shape (N,).
+        nms_thr (float): IoU threshold above which boxes are suppressed.
+        top_k (int, optional): Only consider the `top_k` highest scores.
+            Defaults to None (all candidates).
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, in descending score order.
+    """
+    if top_k is not None and top_k < len(scores):
+        # partial sort, only the top-k candidates are ordered
+        order = np.argpartition(-scores, top_k - 1)[:top_k]
+        order = order[np.argsort(-scores[order], kind='stable')]
+    else:
+        order = scores.argsort()[::-1]
+
     x1 = boxes[:, 0]
     y1 = boxes[:, 1]
     x2 = boxes[:, 2]
     y2 = boxes[:, 3]
-
     areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-    order = scores.argsort()[::-1]
 
     keep = []
     while order.size > 0:
         i = order[0]
         keep.append(i)
-        xx1 = np.maximum(x1[i], x1[order[1:]])
-        yy1 = np.maximum(y1[i], y1[order[1:]])
-        xx2 = np.minimum(x2[i], x2[order[1:]])
-        yy2 = np.minimum(y2[i], y2[order[1:]])
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
 
         w = np.maximum(0.0, xx2 - xx1 + 1)
         h = np.maximum(0.0, yy2 - yy1 + 1)
         inter = w * h
-        ovr = inter / (areas[i] + areas[order[1:]] - inter)
+        ovr = inter / (areas[i] + areas[rest] - inter)
 
-        inds = np.where(ovr <= nms_thr)[0]
-        order = order[inds + 1]
+        order = rest[ovr <= nms_thr]
 
-    return keep
+    return np.array(keep, dtype=np.intp)
 
 
-def multiclass_nms(boxes, scores, nms_thr, score_thr):
+def multiclass_nms(boxes, scores, nms_thr, score_thr, top_k=1000):
     """Multiclass NMS implemented in Numpy.
 
-    Class-aware version.
+    Class-aware version. The candidates of every class above `score_thr`
+    are cut to the `top_k` best before NMS, which bounds the cost of the
+    greedy loop when a low threshold lets thousands of candidates through.
+
+    Args:
+        boxes (np.ndarray): Boxes in shape (N, 4), xyxy format.
+        scores (np.ndarray): Scores in shape (N, num_classes).
+        nms_thr (float): IoU threshold of NMS.
+        score_thr (float): Minimum score of a candidate.
+        top_k (int, optional): Maximum number of candidates per class kept
+            before NMS, by score. None keeps all. Defaults to 1000.
+
+    Returns:
+        tuple:
+        - dets (np.ndarray): Kept detections (x1, y1, x2, y2, score, class)
+            in shape (M, 6), sorted by class then score. None if nothing is
+            kept.
+        - keep (np.ndarray): Indices of the kept detections in `boxes`.
+            None if nothing is kept.
     """
     final_dets = []
+    final_inds = []
     num_classes = scores.shape[1]
     for cls_ind in range(num_classes):
         cls_scores = scores[:, cls_ind]
-        valid_score_mask = cls_scores > score_thr
-        if valid_score_mask.sum() == 0:
+        valid_inds = np.nonzero(cls_scores > score_thr)[0]
+        if valid_inds.size == 0:
             continue
-        else:
-            valid_scores = cls_scores[valid_score_mask]
-            valid_boxes = boxes[valid_score_mask]
-            keep = nms(valid_boxes, valid_scores, nms_thr)
-            if len(keep) > 0:
-                cls_inds = np.ones((len(keep), 1)) * cls_ind
-                dets = np.concatenate(
-                    [valid_boxes[keep], valid_scores[keep, None], cls_inds], 1)
-                final_dets.append(dets)
+        valid_scores = cls_scores[valid_inds]
+        keep = nms(boxes[valid_inds], valid_scores, nms_thr, top_k)
+        box_inds = valid_inds[keep]
+        cls_inds = np.full((len(keep), 1), cls_ind, dtype=np.float64)
+        final_dets.append(
+            np.concatenate(
+                [boxes[box_inds], valid_scores[keep, None], cls_inds], 1))
+        final_inds.append(box_inds)
     if len(final_dets) == 0:
         return None, None
-    return np.concatenate(final_dets, 0), keep
+    return np.concatenate(final_dets, 0), np.concatenate(final_inds)
+
+
+@lru_cache(maxsize=8)
+def get_anchor_grids(
+        model_input_size: Tuple[int, int],
+        strides: Tuple[int, ...] = (8, 16, 32)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the anchor point grids of a YOLOX-style head.
+
+    The result is cached per input size and must not be modified.
+
+    Args:
+        model_input_size (tuple): Model input size (h, w).
+        strides (tuple): Strides of the feature maps.
+
+    Returns:
+        tuple:
+        - grids (np.ndarray): (x, y) cell of every anchor in shape (A, 2).
+        - expanded_strides (np.ndarray): Stride of every anchor in shape
+            (A, 1).
+    """
+    grids = []
+    expanded_strides = []
+    for stride in strides:
+        hsize = model_input_size[0] // stride
+        wsize = model_input_size[1] // stride
+        xv, yv = np.meshgrid(np.arange(wsize), np.arange(hsize))
+        grids.append(np.stack((xv, yv), 2).reshape(-1, 2))
+        expanded_strides.append(np.full((hsize * wsize, 1), stride))
+
+    grids = np.concatenate(grids, 0).astype(np.float32)
+    expanded_strides = np.concatenate(expanded_strides, 0).astype(np.float32)
+    grids.flags.writeable = False
+    expanded_strides.flags.writeable = False
+    return grids, expanded_strides
+
+
+def decode_yolox_boxes(predictions: np.ndarray,
+                       model_input_size: Tuple[int, int],
+                       ratio: float = 1.) -> np.ndarray:
+    """Decode raw YOLOX-style head predictions into xyxy boxes in place.
+
+    Args:
+        predictions (np.ndarray): Raw predictions of one image in shape
+            (A, 4 + ...), as (cx, cy, log w, log h, ...) relative to the
+            anchor grid. The first 4 columns are overwritten.
+        model_input_size (tuple): Model input size (h, w).
+        ratio (float): Ratio of preprocessing.
+
+    Returns:
+        np.ndarray: View of the decoded boxes (x1, y1, x2, y2) in the
+            original image, in shape (A, 4).
+    """
+    grids, expanded_strides = get_anchor_grids(tuple(model_input_size))
+
+    xy = predictions[:, :2]
+    wh = predictions[:, 2:4]
+    xy += grids
+    xy *= expanded_strides
+    np.exp(wh, out=wh)
+    wh *= expanded_strides
+
+    # (cx, cy, w, h) -> (x1, y1, x2, y2)
+    wh *= 0.5
+    xy -= wh
+    wh *= 2.
+    wh += xy
+
+    boxes = predictions[:, :4]
+    boxes /= ratio
+    return boxes
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class LetterBox:
+    """Fused letterbox preprocessing shared by YOLOX, RTMDet and RTMO.
+
+    Resizes the image into the top-left corner of a padded canvas of the
+    model input size, normalizes it and writes it as a float32 (3, H, W)
+    array, in a single pass per channel. The resize ratio, the resize buffer
+    and the already padded output are cached per input resolution, so a
+    video of constant size does no allocation after the first frame. Only
+    the `max_cached` most recently used resolutions and batch sizes are
+    kept, inputs of ever changing size such as crops would otherwise grow
+    the cache without limit.
+
+    Args:
+        model_input_size (tuple): Model input size (h, w).
+        mean (tuple): Per-channel mean, or None to skip normalization.
+        std (tuple): Per-channel std, or None to skip normalization.
+        pad_value (int): Value of the padded area before normalization.
+        uint8_hwc (bool): Write the unnormalized image as uint8 (H, W, 3)
+            instead, for models with the preprocessing embedded.
+        max_cached (int): Number of input resolutions and batch sizes whose
+            buffers are cached.
+    """
+
+    def __init__(self,
+                 model_input_size: tuple,
+                 mean: Optional[tuple] = None,
+                 std: Optional[tuple] = None,
+                 pad_value: int = 114,
+                 uint8_hwc: bool = False,
+                 max_cached: int = 8):
+        self.model_input_size = tuple(model_input_size)
+        self.pad_value = pad_value
+        self.uint8_hwc = uint8_hwc
+        self.max_cached = max_cached
+
+        if mean is not None:
+            self.mean = np.array(mean, dtype=np.float32)
+            self.inv_std = 1. / np.array(std, dtype=np.float32)
+            self.pad = (pad_value - self.mean) * self.inv_std
+        else:
+            self.mean = None
+            self.inv_std = None
+            self.pad = np.full(3, pad_value, dtype=np.float32)
+
+        self._cache = OrderedDict()
+
+    def _cache_get(self, key):
+        """Get a cached entry and mark it as the most recently used."""
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, key, value):
+        """Cache an entry, evicting the least recently used one if full."""
+        self._cache[key] = value
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def _get_state(self, img_shape: Tuple[int, int]):
+        """Get ratio, resized size and buffers for an input resolution."""
+        state = self._cache_get(img_shape)
+        if state is not None:
+            return state
+
+        h, w = self.model_input_size
+        ratio = min(h / img_shape[0], w / img_shape[1])
+        resized_shape = (int(img_shape[0] * ratio), int(img_shape[1] * ratio))
+        resized = np.empty((*resized_shape, 3), dtype=np.uint8)
+
+        if self.uint8_hwc:
+            output = np.empty((h, w, 3), dtype=np.uint8)
+        else:
+            output = np.empty((3, h, w), dtype=np.float32)
+        self._fill_pad(output, resized_shape)
+
+        state = (ratio, resized_shape, resized, output)
+        self._cache_put(img_shape, state)
+        return state
+
+    def _fill_pad(self, output: np.ndarray, resized_shape: Tuple[int, int]):
+        """Write the normalized pad value around the resized area."""
+        rh, rw = resized_shape
+        if self.uint8_hwc:
+            output[rh:] = self.pad_value
+            output[:rh, rw:] = self.pad_value
+            return
+        for c in range(3):
+            output[c, rh:, :] = self.pad[c]
+            output[c, :rh, rw:] = self.pad[c]
+
+    def __call__(self,
+                 img: np.ndarray,
+                 out: Optional[np.ndarray] = None
+                 ) -> Tuple[np.ndarray, float]:
+        """Letterbox an image into the model input layout.
+
+        Args:
+            img (np.ndarray): Input image in shape (H, W, 3).
+            out (np.ndarray, optional): Array in the output layout to
+                write into, e.g. one slot of a batch or a bound model input.
+                Defaults to a buffer cached for this input resolution, which
+                is overwritten by the next call.
+
+        Returns:
+            tuple:
+            - padded_img (np.ndarray): Preprocessed image in shape
+                (3, h, w), float32, or (h, w, 3) uint8 with `uint8_hwc`.
+            - ratio (float): Resize ratio of the image.
+        """
+        ratio, resized_shape, resized, output = self._get_state(
+            img.shape[:2])
+        if out is None:
+            out = output
+        else:
+            self._fill_pad(out, resized_shape)
+
+        rh, rw = resized_shape
+        cv2.resize(img, (rw, rh), dst=resized, interpolation=cv2.INTER_LINEAR)
+
+        if self.uint8_hwc:
+            out[:rh, :rw] = resized
+            return out, ratio
+
+        for c in range(3):
+            dst = out[c, :rh, :rw]
+            if self.mean is None:
+                np.copyto(dst, resized[..., c], casting='unsafe')
+            else:
+                np.subtract(resized[..., c], self.mean[c], out=dst)
+                np.multiply(dst, self.inv_std[c], out=dst)
+
+        return out, ratio
+
+    def batch(self,
+              imgs: List[np.ndarray],
+              out: Optional[np.ndarray] = None
+              ) -> Tuple[np.ndarray, np.ndarray]:
+        """Letterbox several images into one model input batch.
+
+        Args:
+            imgs (List[np.ndarray]): Input images in shape (H, W, 3), of any
+                resolutions.
+            out (np.ndarray, optional): Batch to write into, e.g. a bound
+                model input. Defaults to a buffer cached for the batch size,
+                which is overwritten by the next call.
+
+        Returns:
+            tuple:
+            - padded_imgs (np.ndarray): Preprocessed images in shape
+                (N, 3, h, w), float32, or (N, h, w, 3) uint8 with
+                `uint8_hwc`.
+            - ratios (np.ndarray): Resize ratio of each image.
+        """
+        if out is None:
+            h, w = self.model_input_size
+            shape = (len(imgs), h, w, 3) if self.uint8_hwc else \
+                (len(imgs), 3, h, w)
+            out = self._cache_get(shape)
+            if out is None:
+                out = np.empty(shape,
+                               dtype=np.uint8 if self.uint8_hwc else np.float32)
+                self._cache_put(shape, out)
+
+        ratios = np.empty(len(imgs), dtype=np.float64)
+        for i, img in enumerate(imgs):
+            _, ratios[i] = self(img, out=out[i])
+        return out, ratios
@@ -0,0 +1,206 @@
+'''
+Offline rewrite of rtmlib ONNX models with the preprocessing embedded.
+
+The rewritten model takes raw uint8 images in (N, H, W, 3) and does the
+float cast, mean/std normalization and HWC->CHW transpose inside the graph,
+so ONNX Runtime runs them instead of numpy. It is saved next to the
+original as `<name>_uint8.onnx` and picked up by the models when they are
+built with `uint8_input=True`, which also rewrites missing models on the
+fly.
+
+Example:
+
+# rewrite every model in the download_checkpoint cache
+python -m rtmlib.tools.onnx_preprocess
+
+# rewrite a single model
+python -m rtmlib.tools.onnx_preprocess rtmpose.onnx \
+    --mean 123.675 116.28 103.53 --std 58.395 57.12 57.375
+'''
+import argparse
+import os
+from glob import glob
+from typing import List, Optional
+
+import numpy as np
+
+from .file import _get_rtmhub_dir
+
+UINT8_SUFFIX = '_uint8'
+METADATA_KEY = 'rtmlib_preprocess'
+
+RTMPOSE_NORM = ((123.675, 116.28, 103.53), (58.395, 57.12, 57.375))
+RTMDET_NORM = ((103.53, 116.28, 123.675), (57.375, 57.12, 58.395))
+
+# (mean, std) of the cached checkpoints, by file name prefix
+CHECKPOINT_NORMS = {
+    'rtmpose': RTMPOSE_NORM,
+    'rtmw': RTMPOSE_NORM,
+    'rtmdet': RTMDET_NORM,
+    'rtmo': (None, None),
+    'yolox': (None, None),
+}
+
+
+def _preprocess_tag(mean: Optional[tuple], std: Optional[tuple]) -> str:
+    """Metadata value describing the embedded preprocessing."""
+    if mean is None:
+        return 'uint8_nhwc'
+    mean = ','.join(repr(float(v)) for v in mean)
+    std = ','.join(repr(float(v)) for v in std)
+    return f'uint8_nhwc mean={mean} std={std}'
+
+
+def _read_preprocess_tag(onnx_model: str) -> Optional[str]:
+    """Embedded preprocessing of a model, None if it has none."""
+    import onnx
+
+    model = onnx.load(onnx_model, load_external_data=False)
+    for prop in model.metadata_props:
+        if prop.key == METADATA_KEY:
+            return prop.value
+    return None
+
+
+def embed_preprocessing(onnx_model: str,
+                        mean: Optional[tuple] = None,
+                        std: Optional[tuple] = None,
+                        dst: Optional[str] = None) -> str:
+    """Rewrite an ONNX model to take uint8 (N, H, W, 3) images.
+
+    Args:
+        onnx_model (str): Path of the original model, with a float
+            (N, 3, H, W) input.
+        mean (tuple, optional): Per-channel mean, None to skip
+            normalization.
+        std (tuple, optional): Per-channel std, None to skip normalization.
+        dst (str, optional): Path of the rewritten model. Defaults to
+            `<name>_uint8.onnx` next to the original.
+
+    Returns:
+        str: Path of the rewritten model. An existing rewrite is reused if
+            it is newer than the original and embeds the same mean/std,
+            which are recorded in its metadata.
+    """
+    try:
+        import onnx
+        from onnx import TensorProto, helper, numpy_helper
+    except ImportError:
+        raise ImportError('Embedding the preprocessing needs the onnx '
+                          'package, please `pip install onnx`.')
+
+    if dst is None:
+        dst = os.path.splitext(onnx_model)[0] + UINT8_SUFFIX + '.onnx'
+    tag = _preprocess_tag(mean, std)
+    if os.path.exists(dst) and \
+            os.path.getmtime(dst) >= os.path.getmtime(onnx_model) and \
+            _read_preprocess_tag(dst) == tag:
+        return dst
+
+    model = onnx.load(onnx_model)
+    if any(prop.key == METADATA_KEY for prop in model.metadata_props):
+        return onnx_model
+
+    graph = model.graph
+    old_input = graph.input[0]
+    n, c, h, w = [
+        dim.dim_param or dim.dim_value
+        for dim in old_input.type.tensor_type.shape.dim
+    ]
+    assert c == 3, f'expected a (N, 3, H, W) input, got channel dim {c}'
+
+    new_input = helper.make_tensor_value_info(old_input.name + UINT8_SUFFIX,
+                                              TensorProto.UINT8,
+                                              [n, h, w, 3])
+
+    # uint8 NHWC -> NCHW -> float -> normalized, feeding the old input name.
+    # Transposing the uint8 tensor first moves a quarter of the bytes.
+    cast = 'rtmlib_cast' if mean is not None else old_input.name
+    nodes = [
+        helper.make_node('Transpose', [new_input.name], ['rtmlib_nchw'],
+                         perm=[0, 3, 1, 2]),
+        helper.make_node('Cast', ['rtmlib_nchw'], [cast],
+                         to=TensorProto.FLOAT),
+    ]
+    if mean is not None:
+        graph.initializer.extend([
+            numpy_helper.from_array(
+                np.array(mean, dtype=np.float32).reshape(3, 1, 1),
+                'rtmlib_mean'),
+            numpy_helper.from_array(
+                1. / np.array(std, dtype=np.float32).reshape(3, 1, 1),
+                'rtmlib_inv_std'),
+        ])
+        nodes += [
+            helper.make_node('Sub', [cast, 'rtmlib_mean'], ['rtmlib_sub']),
+            helper.make_node('Mul', ['rtmlib_sub', 'rtmlib_inv_std'],
+                             [old_input.name]),
+        ]
+
+    for i, node in enumerate(nodes):
+        graph.node.insert(i, node)
+    graph.input.remove(old_input)
+    graph.input.insert(0, new_input)
+    helper.set_model_props(model, {
+        **{prop.key: prop.value
+           for prop in model.metadata_props},
+        METADATA_KEY: tag,
+    })
+    onnx.checker.check_model(model)
+
+    # write then move, so a crash never leaves a broken cached model
+    tmp = dst + '.tmp'
+    onnx.save(model, tmp)
+    os.replace(tmp, dst)
+    return dst
+
+
+def rewrite_checkpoints(dst_dir: Optional[str] = None) -> List[str]:
+    """Rewrite every known model in the `download_checkpoint` cache.
+
+    Args:
+        dst_dir (str, optional): Checkpoint directory. Defaults to the
+            rtmlib hub cache.
+
+    Returns:
+        List[str]: Paths of the rewritten models.
+    """
+    if dst_dir is None:
+        dst_dir = os.path.join(_get_rtmhub_dir(), 'checkpoints')
+
+    rewritten = []
+    for onnx_model in sorted(glob(os.path.join(dst_dir, '*.onnx'))):
+        name = os.path.basename(onnx_model)
+        if name.endswith(UINT8_SUFFIX + '.onnx'):
+            continue
+        for prefix, (mean, std) in CHECKPOINT_NORMS.items():
+            if name.startswith(prefix):
+                rewritten.append(embed_preprocessing(onnx_model, mean, std))
+                break
+        else:
+            print(f'skip {onnx_model}: unknown model family')
+    return rewritten
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('onnx_model', nargs='?', default=None,
+                        help='model to rewrite, defaults to the whole cache')
+    parser.add_argument('--mean', type=float, nargs=3, default=None)
+    parser.add_argument('--std', type=float, nargs=3, default=None)
+    parser.add_argument('--dst', default=None)
+    args = parser.parse_args()
+
+    if args.onnx_model is None:
+        paths = rewrite_checkpoints()
+    else:
+        paths = [
+            embed_preprocessing(args.onnx_model, args.mean, args.std,
+                                args.dst)
+        ]
+    for path in paths:
+        print(f'saved {path}')
+
+
+if __name__ == '__main__':
+    main()
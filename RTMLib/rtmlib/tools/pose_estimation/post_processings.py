@@ -24,16 +24,22 @@ def get_simcc_maximum(simcc_x: np.ndarray,
         - vals (np.ndarray): values of maximum heatmap responses in shape
             (K,) or (N, K)
     """
+    if simcc_x.ndim == 2:
+        # single instance
+        locs, vals = get_simcc_maximum(simcc_x[None], simcc_y[None])
+        return locs[0], vals[0]
+
     N, K, Wx = simcc_x.shape
     simcc_x = simcc_x.reshape(N * K, -1)
     simcc_y = simcc_y.reshape(N * K, -1)
 
-    # get maximum value locations
+    # get maximum value locations, and read the values at them instead of
+    # a second pass over the SimCC vectors
     x_locs = np.argmax(simcc_x, axis=1)
     y_locs = np.argmax(simcc_y, axis=1)
+    max_val_x = np.take_along_axis(simcc_x, x_locs[:, None], axis=1)[:, 0]
+    max_val_y = np.take_along_axis(simcc_y, y_locs[:, None], axis=1)[:, 0]
     locs = np.stack((x_locs, y_locs), axis=-1).astype(np.float32)
-    max_val_x = np.amax(simcc_x, axis=1)
-    max_val_y = np.amax(simcc_y, axis=1)
 
     # get maximum value across x and y axis
     # mask = max_val_x > max_val_y
@@ -48,6 +54,44 @@ def get_simcc_maximum(simcc_x: np.ndarray,
     return locs, vals
 
 
+def decode_simcc(simcc_x: np.ndarray,
+                 simcc_y: np.ndarray,
+                 center: np.ndarray,
+                 scale: np.ndarray,
+                 model_input_size: Tuple[int, int],
+                 simcc_split_ratio: float = 2.0
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode batched SimCC outputs to keypoints in image coordinates.
+
+    Takes the SimCC maxima and maps the locations of all N instances from
+    the model input back to the image with one float32 multiply-add.
+
+    Args:
+        simcc_x (np.ndarray): x-axis SimCC in shape (N, K, Wx).
+        simcc_y (np.ndarray): y-axis SimCC in shape (N, K, Wy).
+        center (np.ndarray): Center of the bboxes in shape (2,) or (N, 2).
+        scale (np.ndarray): Scale of the bboxes in shape (2,) or (N, 2).
+        model_input_size (tuple): Model input size (w, h).
+        simcc_split_ratio (float): Split ratio of simcc.
+
+    Returns:
+        tuple:
+        - keypoints (np.ndarray): Keypoints in shape (N, K, 2), float32.
+        - scores (np.ndarray): Keypoint scores in shape (N, K).
+    """
+    locs, scores = get_simcc_maximum(simcc_x, simcc_y)
+
+    center = np.reshape(center, (-1, 1, 2)).astype(np.float32)
+    scale = np.reshape(scale, (-1, 1, 2)).astype(np.float32)
+    input_size = np.array(model_input_size, dtype=np.float32)
+
+    # simcc bin -> input pixel -> image coordinates
+    locs *= scale / (input_size * simcc_split_ratio)
+    locs += center - scale * 0.5
+
+    return locs, scores
+
+
 def convert_coco_to_openpose(keypoints, scores):
     keypoints_info = np.concatenate((keypoints, scores[..., None]), axis=-1)
 
@@ -1,8 +1,27 @@
-from typing import Tuple
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 
 import cv2
 import numpy as np
 
+# warp thread pools by size, shared by all BatchTopDownAffine instances of
+# the process so building more models never starts more threads
+_warp_executors = {}
+_warp_executors_lock = threading.Lock()
+
+
+def _get_warp_executor(num_threads: int) -> ThreadPoolExecutor:
+    """Get the process-wide warp thread pool of a size."""
+    with _warp_executors_lock:
+        executor = _warp_executors.get(num_threads)
+        if executor is None:
+            executor = ThreadPoolExecutor(num_threads,
+                                          thread_name_prefix='rtmlib_warp')
+            _warp_executors[num_threads] = executor
+        return executor
+
 
 def bbox_xyxy2cs(bbox: np.ndarray,
                  padding: float = 1.) -> Tuple[np.ndarray, np.ndarray]:
@@ -163,3 +182,128 @@ def top_down_affine(input_size: dict, bbox_scale: dict, bbox_center: dict,
     img = cv2.warpAffine(img, warp_mat, warp_size, flags=cv2.INTER_LINEAR)
 
     return img, bbox_scale
+
+
+def fix_aspect_ratio(bbox_scale: np.ndarray,
+                     aspect_ratio: float) -> np.ndarray:
+    """Enlarge bbox scales to a fixed aspect ratio.
+
+    Args:
+        bbox_scale (np.ndarray): Bbox scale (w, h) in shape (2,) or (n, 2).
+        aspect_ratio (float): Target width / height ratio.
+
+    Returns:
+        np.ndarray: Bbox scale in the same shape as `bbox_scale`.
+    """
+    b_w, b_h = bbox_scale[..., 0:1], bbox_scale[..., 1:2]
+    return np.where(b_w > b_h * aspect_ratio,
+                    np.concatenate([b_w, b_w / aspect_ratio], axis=-1),
+                    np.concatenate([b_h * aspect_ratio, b_h], axis=-1))
+
+
+def get_warp_matrices(centers: np.ndarray, scales: np.ndarray,
+                      output_size: Tuple[int, int]) -> np.ndarray:
+    """Calculate the affine matrices of many bboxes at once.
+
+    Vectorized `get_warp_matrix` without rotation or shift, where the
+    transform reduces to a uniform scale and a translation.
+
+    Args:
+        centers (np.ndarray): Bbox centers (x, y) in shape (n, 2).
+        scales (np.ndarray): Bbox scales (w, h) in shape (n, 2).
+        output_size (tuple): Size (w, h) of the destination image.
+
+    Returns:
+        np.ndarray: Transformation matrices in shape (n, 2, 3).
+    """
+    dst_w, dst_h = output_size
+    s = dst_w / scales[:, 0]
+
+    warp_mats = np.zeros((len(centers), 2, 3), dtype=np.float64)
+    warp_mats[:, 0, 0] = s
+    warp_mats[:, 1, 1] = s
+    warp_mats[:, 0, 2] = dst_w * 0.5 - s * centers[:, 0]
+    warp_mats[:, 1, 2] = dst_h * 0.5 - s * centers[:, 1]
+    return warp_mats
+
+
+class BatchTopDownAffine:
+    """Batched top-down crop extraction for RTMPose.
+
+    Computes the centers, scales and warp matrices of all bboxes with array
+    operations, then warps every crop into one preallocated (N, H, W, 3)
+    buffer. `cv2.warpAffine` releases the GIL, so crops are warped on a
+    small thread pool when there is more than one. The pool is shared by
+    all instances of the process.
+
+    Args:
+        model_input_size (tuple): Model input size (w, h).
+        padding (float): BBox padding factor. Default: 1.25
+        num_threads (int, optional): Number of warp threads. Defaults to
+            min(4, cpu count). 1 warps in the calling thread.
+    """
+
+    def __init__(self,
+                 model_input_size: Tuple[int, int],
+                 padding: float = 1.25,
+                 num_threads: Optional[int] = None):
+        self.model_input_size = tuple(model_input_size)
+        self.padding = padding
+        if num_threads is None:
+            num_threads = min(4, os.cpu_count() or 1)
+        self.num_threads = num_threads
+
+        self._buffer = None
+
+    def _get_buffer(self, num: int) -> np.ndarray:
+        """Get the crop buffer, grown to at least `num` instances."""
+        if self._buffer is None or len(self._buffer) < num:
+            w, h = self.model_input_size
+            self._buffer = np.empty((num, h, w, 3), dtype=np.uint8)
+        return self._buffer[:num]
+
+    def __call__(
+        self,
+        img: np.ndarray,
+        bboxes: np.ndarray,
+        out: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Crop and warp all bboxes of an image.
+
+        Args:
+            img (np.ndarray): The original image in shape (H, W, 3).
+            bboxes (np.ndarray): xyxy-format bboxes in shape (n, 4).
+            out (np.ndarray, optional): uint8 array in shape (n, h, w, 3) to
+                warp into, e.g. a bound model input. Defaults to a reused
+                buffer, which is overwritten by the next call.
+
+        Returns:
+            tuple:
+            - crops (np.ndarray): Warped crops in shape (n, h, w, 3), uint8.
+            - centers (np.ndarray): Bbox centers in shape (n, 2).
+            - scales (np.ndarray): Bbox scales after the aspect ratio fix,
+                in shape (n, 2).
+        """
+        w, h = self.model_input_size
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+
+        centers, scales = bbox_xyxy2cs(bboxes, padding=self.padding)
+        scales = fix_aspect_ratio(scales, w / h)
+        warp_mats = get_warp_matrices(centers, scales, (w, h))
+
+        crops = self._get_buffer(len(bboxes)) if out is None else out
+
+        def warp(i):
+            cv2.warpAffine(img,
+                           warp_mats[i], (w, h),
+                           dst=crops[i],
+                           flags=cv2.INTER_LINEAR)
+
+        if len(crops) > 1 and self.num_threads > 1:
+            executor = _get_warp_executor(self.num_threads)
+            list(executor.map(warp, range(len(crops))))
+        else:
+            for i in range(len(crops)):
+                warp(i)
+
+        return crops, centers, scales
@@ -1,14 +1,14 @@
 from typing import List, Tuple
 
-import cv2
 import numpy as np
 
-from ..base import BaseTool
+from ..base import SessionConfig
 from .post_processings import convert_coco_to_openpose
+from ..object_detection.base import LetterBoxModel
 from ..object_detection.post_processings import multiclass_nms
 
 
-class RTMO(BaseTool):
+class RTMO(LetterBoxModel):
 
     def __init__(self,
                  onnx_model: str,
@@ -19,20 +19,35 @@ class RTMO(BaseTool):
                  score_thr: float = 0.7,
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
-        super().__init__(onnx_model, model_input_size, mean, std, backend,
-                         device)
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
+        super().__init__(onnx_model,
+                         model_input_size,
+                         mean,
+                         std,
+                         backend,
+                         device,
+                         session_config=session_config,
+                         uint8_input=uint8_input,
+                         quantized=quantized)
         self.to_openpose = to_openpose
         self.nms_thr = nms_thr
         self.score_thr = score_thr
 
     def __call__(self, image: np.ndarray, nms_thr: float = None, score_thr: float = None):
+        return super().__call__(image, nms_thr=nms_thr, score_thr=score_thr)
+
+    def decode(self,
+               outputs: List[np.ndarray],
+               ratio: float,
+               nms_thr: float = None,
+               score_thr: float = None):
+        """Decode the outputs of one image, see `postprocess`."""
         nms_thr = nms_thr if nms_thr is not None else self.nms_thr
         score_thr = score_thr if score_thr is not None else self.score_thr
 
-        image, ratio = self.preprocess(image)
-        outputs = self.inference(image)
-
         keypoints, scores = self.postprocess(outputs, ratio, nms_thr, score_thr)
 
         if self.to_openpose:
@@ -40,43 +55,6 @@ class RTMO(BaseTool):
 
         return keypoints, scores
 
-    def preprocess(self, img: np.ndarray):
-        """Do preprocessing for RTMPose model inference.
-
-        Args:
-            img (np.ndarray): Input image in shape.
-
-        Returns:
-            tuple:
-            - resized_img (np.ndarray): Preprocessed image.
-            - center (np.ndarray): Center of image.
-            - scale (np.ndarray): Scale of image.
-        """
-        if len(img.shape) == 3:
-            padded_img = np.ones(
-                (self.model_input_size[0], self.model_input_size[1], 3),
-                dtype=np.uint8) * 114
-        else:
-            padded_img = np.ones(self.model_input_size, dtype=np.uint8) * 114
-
-        ratio = min(self.model_input_size[0] / img.shape[0],
-                    self.model_input_size[1] / img.shape[1])
-        resized_img = cv2.resize(
-            img,
-            (int(img.shape[1] * ratio), int(img.shape[0] * ratio)),
-            interpolation=cv2.INTER_LINEAR,
-        ).astype(np.uint8)
-        padded_shape = (int(img.shape[0] * ratio), int(img.shape[1] * ratio))
-        padded_img[:padded_shape[0], :padded_shape[1]] = resized_img
-
-        # normalize image
-        if self.mean is not None:
-            self.mean = np.array(self.mean)
-            self.std = np.array(self.std)
-            padded_img = (padded_img - self.mean) / self.std
-
-        return padded_img, ratio
-
     def postprocess(
         self,
         outputs: List[np.ndarray],
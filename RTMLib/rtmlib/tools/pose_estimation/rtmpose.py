@@ -1,10 +1,11 @@
-from typing import List, Tuple
+from typing import Any, Callable, List, Tuple
 
 import numpy as np
 
-from ..base import BaseTool
-from .post_processings import convert_coco_to_openpose, get_simcc_maximum
-from .pre_processings import bbox_xyxy2cs, top_down_affine
+from ..base import BaseTool, SessionConfig
+from .post_processings import convert_coco_to_openpose, decode_simcc
+from .pre_processings import (BatchTopDownAffine, bbox_xyxy2cs,
+                              top_down_affine)
 
 
 class RTMPose(BaseTool):
@@ -16,32 +17,119 @@ class RTMPose(BaseTool):
                  std: tuple = (58.395, 57.12, 57.375),
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
-        super().__init__(onnx_model, model_input_size, mean, std, backend,
-                         device)
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 crop_threads: int = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
+        super().__init__(onnx_model,
+                         model_input_size,
+                         mean,
+                         std,
+                         backend,
+                         device,
+                         session_config=session_config,
+                         uint8_input=uint8_input,
+                         quantized=quantized)
         self.to_openpose = to_openpose
+        self.affine = BatchTopDownAffine(model_input_size,
+                                         padding=1.25,
+                                         num_threads=crop_threads)
+        if mean is not None:
+            self._mean = np.array(mean, dtype=np.float32)
+            self._inv_std = 1. / np.array(std, dtype=np.float32)
 
     def __call__(self, image: np.ndarray, bboxes: list = []):
         if len(bboxes) == 0:
             bboxes = [[0, 0, image.shape[1], image.shape[0]]]
 
-        keypoints, scores = [], []
-        for bbox in bboxes:
-            img, center, scale = self.preprocess(image, bbox)
-            outputs = self.inference(img)
-            kpts, score = self.postprocess(outputs, center, scale)
-
-            keypoints.append(kpts)
-            scores.append(score)
-
-        keypoints = np.concatenate(keypoints, axis=0)
-        scores = np.concatenate(scores, axis=0)
+        # run all instances in a single (N, 3, H, W) batch
+        with self._lock:
+            imgs, centers, scales = self.preprocess_batch(image, bboxes)
+            outputs = self.inference(imgs, channel_first=True)
+            keypoints, scores = self.postprocess(outputs, centers, scales)
 
         if self.to_openpose:
             keypoints, scores = convert_coco_to_openpose(keypoints, scores)
 
         return keypoints, scores
 
+    def submit(self,
+               image: np.ndarray,
+               bboxes: list,
+               callback: Callable,
+               userdata: Any = None):
+        """Estimate poses asynchronously, see `BaseTool.submit_inference`.
+
+        Args:
+            image (np.ndarray): Input image.
+            bboxes (list): xyxy-format bounding boxes of the targets.
+            callback (Callable): Called as
+                `callback((keypoints, scores), userdata)`.
+            userdata (Any): Passed through to `callback`.
+        """
+        if len(bboxes) == 0:
+            bboxes = [[0, 0, image.shape[1], image.shape[0]]]
+
+        def done(outputs, userdata):
+            keypoints, scores = self.postprocess(outputs, centers, scales)
+            if self.to_openpose:
+                keypoints, scores = convert_coco_to_openpose(
+                    keypoints, scores)
+            callback((keypoints, scores), userdata)
+
+        with self._lock:
+            imgs, centers, scales = self.preprocess_batch(image, bboxes)
+            self.submit_inference(imgs, done, userdata, channel_first=True)
+
+    def predict_batch(self, images: List[np.ndarray],
+                      bboxes: List[list]) -> List[tuple]:
+        """Estimate the poses of several images with one model run.
+
+        The crops of all images are stacked into one batch, models with a
+        fixed batch size run it in chunks.
+
+        Args:
+            images (List[np.ndarray]): Input images, e.g. consecutive video
+                frames.
+            bboxes (List[list]): xyxy-format bounding boxes of each image.
+                Images without boxes are estimated on the whole image.
+
+        Returns:
+            List[tuple]: `(keypoints, scores)` of each image.
+        """
+        if len(images) == 0:
+            return []
+        bboxes = [
+            b if len(b) > 0 else [[0, 0, img.shape[1], img.shape[0]]]
+            for img, b in zip(images, bboxes)
+        ]
+        ends = np.cumsum([len(b) for b in bboxes])
+        w, h = self.model_input_size
+        input_shape = self.get_input_shape(int(ends[-1]), h, w)
+        with self._lock:
+            imgs = None
+            if self.batch_size is None or ends[-1] == self.batch_size:
+                imgs = self.get_input_buffer(input_shape)
+            if imgs is None:
+                imgs = np.empty(input_shape, dtype=self.input_dtype)
+
+            centers, scales = [], []
+            for img, b, end in zip(images, bboxes, ends):
+                _, center, scale = self.preprocess_batch(
+                    img, b, out=imgs[end - len(b):end])
+                centers.append(center)
+                scales.append(scale)
+
+            outputs = self.inference(imgs, channel_first=True)
+            keypoints, scores = self.postprocess(outputs,
+                                                 np.concatenate(centers),
+                                                 np.concatenate(scales))
+        if self.to_openpose:
+            keypoints, scores = convert_coco_to_openpose(keypoints, scores)
+        return list(zip(np.split(keypoints, ends[:-1]),
+                        np.split(scores, ends[:-1])))
+
     def preprocess(self, img: np.ndarray, bbox: list):
         """Do preprocessing for RTMPose model inference.
 
@@ -64,26 +152,73 @@ class RTMPose(BaseTool):
         resized_img, scale = top_down_affine(self.model_input_size, scale,
                                              center, img)
         # normalize image
-        if self.mean is not None:
+        if self.mean is not None and not self.uint8_input:
             self.mean = np.array(self.mean)
             self.std = np.array(self.std)
             resized_img = (resized_img - self.mean) / self.std
 
         return resized_img, center, scale
 
+    def preprocess_batch(self,
+                         img: np.ndarray,
+                         bboxes: list,
+                         out: np.ndarray = None):
+        """Do preprocessing for all bboxes of an image at once.
+
+        Args:
+            img (np.ndarray): Input image in shape.
+            bboxes (list): xyxy-format bounding boxes of the targets.
+            out (np.ndarray, optional): Batch of model inputs to write into,
+                e.g. a slice of a larger batch. Defaults to the bound model
+                input, or a new array.
+
+        Returns:
+            tuple:
+            - imgs (np.ndarray): Preprocessed images in shape (N, 3, H, W),
+                float32, or the raw (N, H, W, 3) uint8 crops with
+                `uint8_input`.
+            - centers (np.ndarray): Centers of the bboxes in shape (N, 2).
+            - scales (np.ndarray): Scales of the bboxes in shape (N, 2).
+        """
+        num = len(bboxes)
+        w, h = self.model_input_size
+        input_shape = self.get_input_shape(num, h, w)
+        imgs = out
+        if imgs is None and (self.batch_size is None
+                             or num == self.batch_size):
+            imgs = self.get_input_buffer(input_shape)
+
+        if self.uint8_input:
+            # the model normalizes, warp straight into its input
+            return self.affine(img, bboxes, out=imgs)
+
+        crops, centers, scales = self.affine(img, bboxes)
+        if imgs is None:
+            imgs = np.empty(input_shape, dtype=np.float32)
+
+        # normalize and lay out as (N, 3, H, W) in one pass per channel
+        for c in range(3):
+            if self.mean is None:
+                np.copyto(imgs[:, c], crops[..., c], casting='unsafe')
+            else:
+                np.subtract(crops[..., c], self._mean[c], out=imgs[:, c])
+                np.multiply(imgs[:, c], self._inv_std[c], out=imgs[:, c])
+
+        return imgs, centers, scales
+
     def postprocess(
             self,
             outputs: List[np.ndarray],
-            center: Tuple[int, int],
-            scale: Tuple[int, int],
+            center: np.ndarray,
+            scale: np.ndarray,
             simcc_split_ratio: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
         """Postprocess for RTMPose model output.
 
         Args:
             outputs (np.ndarray): Output of RTMPose model.
             model_input_size (tuple): RTMPose model Input image size.
-            center (tuple): Center of bbox in shape (x, y).
-            scale (tuple): Scale of bbox in shape (w, h).
+            center (np.ndarray): Center of bbox in shape (2,) or (N, 2).
+            scale (np.ndarray): Scale of bbox in shape (2,) or (N, 2).
             simcc_split_ratio (float): Split ratio of simcc.
 
         Returns:
@@ -91,13 +226,10 @@ class RTMPose(BaseTool):
             - keypoints (np.ndarray): Rescaled keypoints.
             - scores (np.ndarray): Model predict scores.
         """
-        # decode simcc
+        # decode simcc and rescale all instances at once
         simcc_x, simcc_y = outputs
-        locs, scores = get_simcc_maximum(simcc_x, simcc_y)
-        keypoints = locs / simcc_split_ratio
-
-        # rescale keypoints
-        keypoints = keypoints / self.model_input_size * scale
-        keypoints = keypoints + center - scale / 2
+        keypoints, scores = decode_simcc(simcc_x, simcc_y, center, scale,
+                                         self.model_input_size,
+                                         simcc_split_ratio)
 
         return keypoints, scores
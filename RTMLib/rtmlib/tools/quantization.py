@@ -0,0 +1,235 @@
+'''
+INT8 quantization of rtmlib ONNX models for CPU inference.
+
+The quantized model is saved next to the original as `<name>_int8.onnx`
+and picked up by the models when they are built with `quantized=True`.
+Missing models are quantized on the fly with dynamic quantization, which
+needs no data. Static quantization calibrates the activation ranges on a
+few local frames first and is usually both faster and more accurate on
+convolutional models, so it is the recommended offline step.
+
+Example:
+
+# statically quantize the detector and pose model of Body(mode='balanced'),
+# calibrated on 32 frames of a local video
+python -m rtmlib.tools.quantization --mode balanced \
+    --calib ./squat.mp4 --num-frames 32
+
+# dynamically quantize a single model
+python -m rtmlib.tools.quantization --model rtmpose.onnx
+'''
+import argparse
+import os
+from glob import glob
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+INT8_SUFFIX = '_int8'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def quantize_model(onnx_model: str,
+                   dst: Optional[str] = None,
+                   calibration_inputs: Optional[List[np.ndarray]] = None,
+                   overwrite: bool = False) -> str:
+    """Quantize an ONNX model to INT8.
+
+    Args:
+        onnx_model (str): Path of the fp32 model.
+        dst (str, optional): Path of the quantized model. Defaults to
+            `<name>_int8.onnx` next to the original.
+        calibration_inputs (List[np.ndarray], optional): Preprocessed model
+            inputs in shape (N, 3, H, W). Given, the model is statically
+            quantized (QDQ, activations calibrated on these inputs),
+            otherwise dynamically.
+        overwrite (bool): Quantize again even if `dst` already exists and
+            is newer than the original.
+
+    Returns:
+        str: Path of the quantized model.
+    """
+    try:
+        from onnxruntime.quantization import (QuantFormat, QuantType,
+                                              quantize_dynamic,
+                                              quantize_static)
+        from onnxruntime.quantization.shape_inference import \
+            quant_pre_process
+    except ImportError:
+        raise ImportError('INT8 quantization needs onnxruntime with the onnx '
+                          'package, please `pip install onnx`.')
+
+    if dst is None:
+        dst = os.path.splitext(onnx_model)[0] + INT8_SUFFIX + '.onnx'
+    if not overwrite and os.path.exists(dst) and \
+            os.path.getmtime(dst) >= os.path.getmtime(onnx_model):
+        return dst
+
+    # shape inference and graph cleanup make more nodes quantizable
+    tmp = dst + '.tmp'
+    prep = dst + '.prep'
+    try:
+        quant_pre_process(onnx_model, prep, skip_symbolic_shape=True)
+    except Exception:
+        prep = onnx_model
+
+    try:
+        if calibration_inputs:
+            quantize_static(prep,
+                            tmp,
+                            _CalibrationReader(prep, calibration_inputs),
+                            quant_format=QuantFormat.QDQ,
+                            activation_type=QuantType.QUInt8,
+                            weight_type=QuantType.QInt8,
+                            per_channel=True)
+        else:
+            quantize_dynamic(prep, tmp, weight_type=QuantType.QUInt8)
+        os.replace(tmp, dst)
+    finally:
+        for path in (tmp, prep):
+            if path != onnx_model and os.path.exists(path):
+                os.remove(path)
+    return dst
+
+
+class _CalibrationReader:
+    """Feed preprocessed inputs to `quantize_static` one batch at a time.
+
+    Implements the `CalibrationDataReader` interface of onnxruntime, which
+    is only imported when a model is quantized.
+    """
+
+    def __init__(self, onnx_model: str, inputs: List[np.ndarray]):
+        import onnx
+
+        model = onnx.load(onnx_model, load_external_data=False)
+        self.input_name = model.graph.input[0].name
+        batch_dim = model.graph.input[0].type.tensor_type.shape.dim[0]
+        # fixed batch models only accept batches of their own size
+        self.batch_size = batch_dim.dim_value or 1
+
+        batches = []
+        for input in inputs:
+            input = np.asarray(input, dtype=np.float32)
+            for start in range(0, len(input), self.batch_size):
+                batch = input[start:start + self.batch_size]
+                if len(batch) == self.batch_size:
+                    batches.append(batch)
+        self.batches = batches
+        self.rewind()
+
+    def get_next(self):
+        batch = next(self._iter, None)
+        if batch is None:
+            return None
+        return {self.input_name: batch}
+
+    def rewind(self):
+        """Start feeding the inputs from the first batch again."""
+        self._iter = iter(self.batches)
+
+
+def load_frames(path: str, num_frames: int = 32) -> List[np.ndarray]:
+    """Load calibration frames from a video or a directory of images.
+
+    Args:
+        path (str): Video file or image directory.
+        num_frames (int): Number of frames, evenly spread over the video.
+
+    Returns:
+        List[np.ndarray]: BGR frames.
+    """
+    if os.path.isdir(path):
+        files = sorted(f for f in glob(os.path.join(path, '*'))
+                       if f.lower().endswith(IMAGE_EXTENSIONS))
+        step = max(1, len(files) // num_frames)
+        return [cv2.imread(f) for f in files[::step][:num_frames]]
+
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    indices = np.linspace(0, max(total - 1, 0), num_frames).astype(int)
+    frames = []
+    for idx in np.unique(indices):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        success, frame = cap.read()
+        if success:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def collect_calibration_inputs(solution,
+                               frames: List[np.ndarray]
+                               ) -> Dict[str, List[np.ndarray]]:
+    """Record the preprocessed inputs of a fp32 solution on some frames.
+
+    The detector sees the letterboxed frames, the pose model the crops of
+    the boxes the detector found, as at inference time.
+
+    Args:
+        solution: A built fp32 solution, e.g. `Body(mode='balanced')`.
+        frames (List[np.ndarray]): BGR frames.
+
+    Returns:
+        Dict[str, List[np.ndarray]]: Model inputs keyed by ONNX file.
+    """
+    det_model = getattr(solution, 'det_model', None)
+    pose_model = solution.pose_model
+
+    inputs = {}
+    for frame in frames:
+        if det_model is not None:
+            img, _ = det_model.preprocess(frame)
+            inputs.setdefault(det_model.onnx_model, []).append(img[None].copy())
+            bboxes = det_model(frame)
+            if len(bboxes) == 0:
+                bboxes = [[0, 0, frame.shape[1], frame.shape[0]]]
+            imgs, _, _ = pose_model.preprocess_batch(frame, bboxes)
+        else:
+            imgs = pose_model.preprocess(frame)[0][None]
+        inputs.setdefault(pose_model.onnx_model, []).append(imgs.copy())
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', default=None,
+                        help='single onnx model to quantize dynamically')
+    parser.add_argument('--solution', default='Body',
+                        help='rtmlib solution whose models are quantized')
+    parser.add_argument('--mode', default='balanced')
+    parser.add_argument('--calib', default=None,
+                        help='video or image directory for static '
+                        'quantization, dynamic if not given')
+    parser.add_argument('--num-frames', type=int, default=32)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+
+    if args.model is not None:
+        print(f'saved {quantize_model(args.model, overwrite=args.overwrite)}')
+        return
+
+    import rtmlib
+    solution = getattr(rtmlib, args.solution)(mode=args.mode)
+    models = [
+        model.onnx_model
+        for model in (getattr(solution, 'det_model', None),
+                      solution.pose_model) if model is not None
+    ]
+
+    calibration = {}
+    if args.calib is not None:
+        frames = load_frames(args.calib, args.num_frames)
+        print(f'calibrating on {len(frames)} frames of {args.calib}')
+        calibration = collect_calibration_inputs(solution, frames)
+
+    for onnx_model in models:
+        dst = quantize_model(onnx_model,
+                             calibration_inputs=calibration.get(onnx_model),
+                             overwrite=args.overwrite)
+        print(f'saved {dst}')
+
+
+if __name__ == '__main__':
+    main()
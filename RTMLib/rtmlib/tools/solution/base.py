@@ -0,0 +1,46 @@
+from typing import Any, Callable
+
+import numpy as np
+
+
+class TwoStageSolution:
+    """Asynchronous API of the solutions made of a detector and a pose
+    model, or of a one-stage pose model only.
+
+    Subclasses set `one_stage`, `pose_model` and, unless one-stage,
+    `det_model`.
+    """
+
+    def submit(self,
+               image: np.ndarray,
+               callback: Callable,
+               userdata: Any = None):
+        """Run the solution asynchronously, several frames can be in flight.
+
+        The pose model is submitted from the detector callback, so neither
+        stage waits for the other. With the OpenVINO backend and
+        `SessionConfig(performance_hint='throughput')` the frames overlap on
+        the CPU, other backends run them right away.
+
+        Args:
+            image (np.ndarray): Input image, kept alive until `callback`.
+            callback (Callable): Called as
+                `callback((keypoints, scores), userdata)` from a worker
+                thread. Callbacks of different frames may arrive out of
+                order.
+            userdata (Any): Passed through to `callback`, e.g. a frame index.
+        """
+        if self.one_stage:
+            self.pose_model.submit(image, callback, userdata)
+            return
+
+        def detected(bboxes, userdata):
+            self.pose_model.submit(image, bboxes, callback, userdata)
+
+        self.det_model.submit(image, detected, userdata)
+
+    def wait_all(self):
+        """Wait until every submitted frame has called back."""
+        if not self.one_stage:
+            self.det_model.wait_all()
+        self.pose_model.wait_all()
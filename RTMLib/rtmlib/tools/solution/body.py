@@ -40,10 +40,15 @@ while cap.isOpened():
     cv2.waitKey(10)
 
 '''
+from typing import List
+
 import numpy as np
 
+from ..base import SessionConfig
+from .base import TwoStageSolution
+
 
-class Body:
+class Body(TwoStageSolution):
     MODE = {
         'performance': {
             'det':
@@ -97,7 +102,10 @@ class Body:
                  mode: str = 'balanced',
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
 
         if pose is not None and 'rtmo' in pose:
             from .. import RTMO
@@ -110,7 +118,10 @@ class Body:
                                    model_input_size=pose_input_size,
                                    to_openpose=to_openpose,
                                    backend=backend,
-                                   device=device)
+                                   device=device,
+                                   session_config=session_config,
+                                   uint8_input=uint8_input,
+                                   quantized=quantized)
         else:
             from .. import YOLOX, RTMPose
 
@@ -127,12 +138,18 @@ class Body:
             self.det_model = YOLOX(det,
                                    model_input_size=det_input_size,
                                    backend=backend,
-                                   device=device)
+                                   device=device,
+                                   session_config=session_config,
+                                   uint8_input=uint8_input,
+                                   quantized=quantized)
             self.pose_model = RTMPose(pose,
                                       model_input_size=pose_input_size,
                                       to_openpose=to_openpose,
                                       backend=backend,
-                                      device=device)
+                                      device=device,
+                                      session_config=session_config,
+                                      uint8_input=uint8_input,
+                                      quantized=quantized)
 
     def __call__(self, image: np.ndarray):
         if self.one_stage:
@@ -142,3 +159,23 @@ class Body:
             keypoints, scores = self.pose_model(image, bboxes=bboxes)
 
         return keypoints, scores
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[tuple]:
+        """Run the solution on several images with one run per model.
+
+        Meant for offline video, where consecutive frames are available up
+        front: the detector (or RTMO) sees all frames in one batch, the pose
+        model all crops of all frames in another.
+
+        Args:
+            images (List[np.ndarray]): Input images, e.g. consecutive video
+                frames.
+
+        Returns:
+            List[tuple]: `(keypoints, scores)` of each image.
+        """
+        if self.one_stage:
+            return self.pose_model.predict_batch(images)
+
+        bboxes = self.det_model.predict_batch(images)
+        return self.pose_model.predict_batch(images, bboxes)
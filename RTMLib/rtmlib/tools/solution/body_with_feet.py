@@ -42,6 +42,8 @@ while cap.isOpened():
 
 import numpy as np
 
+from ..base import SessionConfig
+
 class BodyWithFeet:
     """
     BodyWithFeet class for human pose estimation using the Halpe26 keypoint format.
@@ -77,7 +79,10 @@ class BodyWithFeet:
                  mode: str = 'balanced',
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
         """
         Initialize the Halpe26 pose estimation model.
 
@@ -90,6 +95,9 @@ class BodyWithFeet:
             to_openpose (bool, optional): Whether to convert output to OpenPose format. Default is False.
             backend (str, optional): Backend for inference ('onnxruntime' or 'opencv'). Default is 'onnxruntime'.
             device (str, optional): Device for inference ('cpu' or 'cuda'). Default is 'cpu'.
+            session_config (SessionConfig, optional): Runtime options for the inference sessions. Default is None.
+            uint8_input (bool, optional): Use models with the preprocessing embedded, fed with raw uint8 frames. Default is False.
+            quantized (bool, optional): Use INT8 quantized models, quantizing them on first use if needed. Default is False.
         """
         from .. import YOLOX, RTMPose
 
@@ -104,12 +112,18 @@ class BodyWithFeet:
         self.det_model = YOLOX(det,
                                model_input_size=det_input_size,
                                backend=backend,
-                               device=device)
+                               device=device,
+                               session_config=session_config,
+                               uint8_input=uint8_input,
+                               quantized=quantized)
         self.pose_model = RTMPose(pose,
                                   model_input_size=pose_input_size,
                                   to_openpose=to_openpose,
                                   backend=backend,
-                                  device=device)
+                                  device=device,
+                                  session_config=session_config,
+                                  uint8_input=uint8_input,
+                                  quantized=quantized)
 
     def __call__(self, image: np.ndarray):
         """
@@ -68,10 +68,14 @@ while cap.isOpened():
 '''
 import numpy as np
 import importlib
+
+from ..base import SessionConfig
+from .base import TwoStageSolution
+
 rtmlib_module = importlib.import_module("rtmlib")
 
 
-class Custom:
+class Custom(TwoStageSolution):
     def __init__(self,
                  det_class: str = None,
                  det: str = None,
@@ -82,7 +86,10 @@ class Custom:
                  mode: str = None,
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
 
         if det_class is not None:
             try:
@@ -90,7 +97,10 @@ class Custom:
                 self.det_model = det_class(det,
                                     model_input_size=det_input_size,
                                     backend=backend,
-                                    device=device)
+                                    device=device,
+                                    session_config=session_config,
+                                    uint8_input=uint8_input,
+                                    quantized=quantized)
                 self.one_stage = False
 
             except ImportError:
@@ -105,7 +115,10 @@ class Custom:
                                     model_input_size=pose_input_size,
                                     to_openpose=to_openpose,
                                     backend=backend,
-                                    device=device)
+                                    device=device,
+                                    session_config=session_config,
+                                    uint8_input=uint8_input,
+                                    quantized=quantized)
             except ImportError:
                 raise ImportError(f'{pose_class} is not supported by rtmlib.')
 
@@ -43,6 +43,7 @@ while cap.isOpened():
 import numpy as np
 
 from .. import RTMDet, RTMPose
+from ..base import SessionConfig
 
 
 class Hand:
@@ -65,7 +66,10 @@ class Hand:
                  mode: str = 'lightweight',
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
         print('hand', backend, device)
         assert mode == 'lightweight', (
             'Currently only support lightweight mode.')
@@ -81,12 +85,18 @@ class Hand:
         self.det_model = RTMDet(det,
                                 model_input_size=det_input_size,
                                 backend=backend,
-                                device=device)
+                                device=device,
+                                session_config=session_config,
+                                uint8_input=uint8_input,
+                                quantized=quantized)
         self.pose_model = RTMPose(pose,
                                   model_input_size=pose_input_size,
                                   to_openpose=to_openpose,
                                   backend=backend,
-                                  device=device)
+                                  device=device,
+                                  session_config=session_config,
+                                  uint8_input=uint8_input,
+                                  quantized=quantized)
 
     def __call__(self, image: np.ndarray):
         bboxes = self.det_model(image)
@@ -71,6 +71,8 @@ import warnings
 
 import numpy as np
 
+from ..base import SessionConfig
+
 
 def compute_iou(bboxA, bboxB):
     """Compute the Intersection over Union (IoU) between two boxes .
@@ -126,6 +128,9 @@ def pose_to_bbox(keypoints: np.ndarray, expansion: float = 1.25) -> np.ndarray:
 class PoseTracker:
     """Pose tracker for pose estimation.
 
+    Builds its solution from the arguments below, use `from_solution` to
+    track with a solution that is already built.
+
     Args:
         solution (type): rtmlib solutions, e.g. Wholebody, Body, Custom, etc.
         det_frequency (int): Frequency of object detection.
@@ -133,6 +138,12 @@ class PoseTracker:
         to_openpose (bool): Whether to use openpose-style skeleton.
         backend (str): Backend of pose estimation model.
         device (str): Device of pose estimation model.
+        session_config (SessionConfig): Runtime options shared by the
+            detection and pose estimation sessions.
+        uint8_input (bool): Whether to use models with the preprocessing
+            embedded, fed with raw uint8 frames and crops.
+        quantized (bool): Whether to use INT8 quantized models, see
+            `rtmlib.tools.quantization`.
     """
     MIN_AREA = 1000
 
@@ -144,13 +155,48 @@ class PoseTracker:
                  mode: str = 'balanced',
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
 
         model = solution(mode=mode,
                          to_openpose=to_openpose,
                          backend=backend,
-                         device=device)
+                         device=device,
+                         session_config=session_config,
+                         uint8_input=uint8_input,
+                         quantized=quantized)
+        self._init_tracking(model, det_frequency, tracking, tracking_thr)
+
+    @classmethod
+    def from_solution(cls,
+                      solution,
+                      det_frequency: int = 1,
+                      tracking: bool = True,
+                      tracking_thr: float = 0.3) -> 'PoseTracker':
+        """Build a pose tracker around an already built solution.
+
+        The models of the solution are shared, nothing is loaded again, so
+        several trackers, e.g. one per video, can use the same solution.
 
+        Args:
+            solution: Built rtmlib solution, e.g. `Body()`.
+            det_frequency (int): Frequency of object detection.
+            tracking (bool): Whether to track the people by IoU.
+            tracking_thr (float): Minimum IoU to continue a track.
+
+        Returns:
+            PoseTracker: Tracker running the models of `solution`.
+        """
+        tracker = cls.__new__(cls)
+        tracker._init_tracking(solution, det_frequency, tracking,
+                               tracking_thr)
+        return tracker
+
+    def _init_tracking(self, model, det_frequency: int, tracking: bool,
+                       tracking_thr: float):
+        """Take the models of a built solution and reset the tracks."""
         try:
             self.det_model = model.det_model
         except: # rtmo
@@ -200,7 +246,8 @@ class PoseTracker:
 
             bboxes_current_frame = []
             track_ids_current_frame = []
-            for kpts in keypoints:
+            kept = []
+            for i, kpts in enumerate(keypoints):
                 bbox = pose_to_bbox(kpts)
 
                 track_id, _ = self.track_by_iou(bbox)
@@ -208,12 +255,18 @@ class PoseTracker:
                 if track_id > -1:
                     track_ids_current_frame.append(track_id)
                     bboxes_current_frame.append(bbox)
-
-            self.track_ids_last_frame = track_ids_current_frame
-
-            # reorder keypoints, scores according to track_id
-            keypoints = np.array([keypoints[i] for i in self.track_ids_last_frame])
-            scores = np.array([scores[i] for i in self.track_ids_last_frame])
+                    kept.append(i)
+
+            # reorder according to track_id, the longest tracked person
+            # comes first
+            order = np.argsort(track_ids_current_frame, kind='stable')
+            self.track_ids_last_frame = [
+                track_ids_current_frame[i] for i in order
+            ]
+            bboxes_current_frame = [bboxes_current_frame[i] for i in order]
+            kept = np.array(kept, dtype=int)[order]
+            keypoints = keypoints[kept]
+            scores = scores[kept]
 
         self.bboxes_last_frame = bboxes_current_frame
         self.frame_cnt += 1
@@ -45,6 +45,7 @@ from typing import List, Optional
 import numpy as np
 
 from .. import YOLOX, RTMPose
+from ..base import SessionConfig
 from .utils.types import BodyResult, Keypoint, PoseResult
 
 
@@ -85,7 +86,10 @@ class Wholebody:
                  mode: str = 'balanced',
                  to_openpose: bool = False,
                  backend: str = 'onnxruntime',
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 session_config: SessionConfig = None,
+                 uint8_input: bool = False,
+                 quantized: bool = False):
 
         if det is None:
             det = self.MODE[mode]['det']
@@ -98,12 +102,18 @@ class Wholebody:
         self.det_model = YOLOX(det,
                                model_input_size=det_input_size,
                                backend=backend,
-                               device=device)
+                               device=device,
+                               session_config=session_config,
+                               uint8_input=uint8_input,
+                               quantized=quantized)
         self.pose_model = RTMPose(pose,
                                   model_input_size=pose_input_size,
                                   to_openpose=to_openpose,
                                   backend=backend,
-                                  device=device)
+                                  device=device,
+                                  session_config=session_config,
+                                  uint8_input=uint8_input,
+                                  quantized=quantized)
 
     def __call__(self, image: np.ndarray):
         bboxes = self.det_model(image)
@@ -0,0 +1,142 @@
+import numpy as np
+from rtmlib.tools.solution.pose_tracker import compute_iou, pose_to_bbox
+import config
+
+
+class SubjectLock:
+    """
+    Follows one person through the video and runs the pose model on that person only.
+
+    The subject is picked on the first detection: the largest person, or the person closest to
+    a point of the frame (its center for 'central'). On every `det_frequency`-th frame the
+    detection overlapping the subject's box the most is taken, in between the box comes from
+    the subject's previous keypoints. If no detection overlaps, the subject is picked again as
+    the person closest to where it was last seen. Bystanders never go through the pose model.
+
+    With `roi_det_model`, re-detection only looks at a crop around the subject's box, the
+    full frame is searched on every `full_det_interval`-th detection and whenever the subject
+    is not found in the crop. On high resolution footage where the lifter fills a fraction of
+    the frame this is both cheaper and detects at a higher effective resolution.
+
+    Args:
+        det_model (YOLOX | RTMDet): Person detector.
+        pose_model (RTMPose): Top-down pose model.
+        subject (str | tuple): 'largest', 'central', or an (x, y) point as fractions of the
+            frame width and height, e.g. where the user clicked.
+        det_frequency (int): Detect on every N-th frame, 1 = every frame.
+        iou_thr (float): Minimum overlap of a detection with the subject's box to be the subject.
+        roi_det_model (YOLOX | RTMDet, optional): Detector run on the crops around the subject,
+            e.g. `det_model.with_input_size` at a smaller size. None = always the full frame.
+        roi_expansion (float): Size of the crop relative to the subject's box.
+        full_det_interval (int): Search the full frame on every N-th detection, 0 = only when
+            the subject is lost.
+        crop_align (int): Crop sizes are rounded up to multiples of this many pixels, so the
+            detector sees a few crop sizes instead of a new one almost every time.
+    """
+    STRATEGIES = ('largest', 'central')
+
+    def __init__(self, det_model, pose_model, subject='largest', det_frequency=1, iou_thr=config.SUBJECT_IOU_THRESHOLD,
+                 roi_det_model=None, roi_expansion=config.ROI_EXPANSION, full_det_interval=config.ROI_FULL_DETECTION_INTERVAL,
+                 crop_align=config.ROI_CROP_ALIGN):
+        if isinstance(subject, str) and subject not in self.STRATEGIES:
+            raise ValueError(f"Unknown subject lock {subject!r}, expected one of {self.STRATEGIES} or an (x, y) point")
+        self.det_model = det_model
+        self.pose_model = pose_model
+        self.subject = (0.5, 0.5) if subject == 'central' else subject
+        self.det_frequency = max(1, int(det_frequency))
+        self.iou_thr = iou_thr
+        self.roi_det_model = roi_det_model
+        self.roi_expansion = roi_expansion
+        self.full_det_interval = full_det_interval
+        self.crop_align = max(1, int(crop_align))
+        self.reset()
+
+    def reset(self):
+        """Forgets the subject, call at the start of every video."""
+        self.bbox = None # Box of the subject from its last keypoints
+        self.frame_cnt = 0
+        self.det_cnt = 0
+        self.num_roi_detections = 0
+        self.num_full_detections = 0
+
+    def _pick(self, bboxes, frame_shape):
+        # Index of the subject among bboxes when there is no box to match
+        if self.bbox is not None:
+            # Lost, take the person closest to where the subject was last seen
+            point = (self.bbox[:2] + self.bbox[2:4]) / 2
+        elif self.subject == 'largest':
+            return int(np.argmax((bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])))
+        else:
+            h, w = frame_shape[:2]
+            point = np.array([self.subject[0] * w, self.subject[1] * h])
+        centers = (bboxes[:, :2] + bboxes[:, 2:4]) / 2
+        return int(np.argmin(np.linalg.norm(centers - point, axis=1)))
+
+    def _match(self, bboxes):
+        # The detection overlapping the subject's box the most, None if none overlaps enough
+        if self.bbox is None or len(bboxes) == 0:
+            return None
+        ious = [compute_iou(b, self.bbox) for b in bboxes]
+        return bboxes[int(np.argmax(ious))] if max(ious) > self.iou_thr else None
+
+    def _detect_roi(self, image):
+        # Detects in the crop around the subject's box, boxes in frame coordinates
+        h, w = image.shape[:2]
+        x1, y1, x2, y2 = pose_to_bbox(self.bbox.reshape(2, 2), self.roi_expansion)
+        if x2 <= 0 or y2 <= 0 or x1 >= w or y1 >= h:
+            return np.zeros((0, 4), dtype=np.float32)
+        x1, x2 = self._align(x1, x2, w)
+        y1, y2 = self._align(y1, y2, h)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return np.zeros((0, 4), dtype=np.float32)
+        self.num_roi_detections += 1
+        bboxes = np.asarray(self.roi_det_model(image[y1:y2, x1:x2])).reshape(-1, 4)
+        return bboxes + np.array([x1, y1, x1, y1], dtype=bboxes.dtype)
+
+    def _align(self, start, end, limit):
+        # Crop range rounded up to a multiple of crop_align around its center, shifted into [0, limit)
+        size = min(limit, int(np.ceil((end - start) / self.crop_align)) * self.crop_align)
+        start = min(max(0, int(round((start + end - size) / 2))), limit - size)
+        return start, start + size
+
+    def _detect(self, image):
+        # Box of the subject on a detection frame, None if nobody is detected
+        bbox = None
+        self.det_cnt += 1
+        full = self.roi_det_model is None or self.bbox is None or \
+            (self.full_det_interval > 0 and self.det_cnt % self.full_det_interval == 0)
+        if not full:
+            bbox = self._match(self._detect_roi(image))
+            if bbox is None:
+                full = True # Not in the crop, search the whole frame
+        if full:
+            self.num_full_detections += 1
+            bboxes = np.asarray(self.det_model(image)).reshape(-1, 4)
+            if len(bboxes) > 0:
+                bbox = self._match(bboxes)
+                if bbox is None:
+                    bbox = bboxes[self._pick(bboxes, image.shape)]
+        return bbox
+
+    def __call__(self, image):
+        """
+        Estimates the pose of the subject.
+
+        Args:
+            image (np.ndarray): BGR frame.
+
+        Returns:
+            tuple: (keypoints, scores) of shape (1, 17, 2) and (1, 17), or with 0 people when
+                   nobody is detected.
+        """
+        bbox = self.bbox
+        if bbox is None or self.frame_cnt % self.det_frequency == 0:
+            bbox = self._detect(image)
+        self.frame_cnt += 1
+
+        if bbox is None:
+            self.bbox = None # Detect again on the next frame
+            return np.zeros((0, 17, 2), dtype=np.float32), np.zeros((0, 17), dtype=np.float32)
+        keypoints, scores = self.pose_model(image, bboxes=[bbox])
+        self.bbox = pose_to_bbox(keypoints[0])
+        return keypoints, scores